@@ -0,0 +1,224 @@
+"""
+以表格座標解析測驗式試題標準答案 PDF
+
+resolve_answer_from_pdf 原本把答案卷送 gemini-2.0-flash 辨識，每份考卷多一次 API 往返與上千 token。
+答案卷其實是固定格式的表格：「題號」（或「題序」）列與其下方的「答案」列交錯排列，
+每格一個全形字母 ＡＢＣＤ 或 ＃，最後是「備註」（例如：第32題答Ｂ、Ｃ給分）。
+
+本模組以 pdfplumber 取得每個文字的座標，依 top 分列，再將答案列中的每個文字
+對應到水平位置最接近的題號欄，因此同一格中的多個字母（例如 ＢＣ）會合併為同一題的答案。
+標為 ＃ 的題目若在備註中有更正答案則改用更正後的答案，備註為一律給分（送分）者維持 #。
+
+輸出與 Gemini 的 PreAnswerItem 相同：[{"no": 題號, "answer": "C"}]，答案為半形字母。
+表格不完整（沒有題號列、題號不連續、題號沒有對應的答案，或題數與「題數」欄位不符）時
+丟出 AnswerSheetError，由呼叫端改用 Gemini 解析。
+
+使用方式：
+    python answer_sheet.py A1.pdf
+"""
+
+import argparse
+import io
+import re
+import unicodedata
+
+import pdfplumber
+
+NUMBER_LABELS = ("題號", "題序")
+ANSWER_LABEL = "答案"
+ROW_TOLERANCE = 3  # top 相差在此範圍內的文字視為同一列
+GIVEN_ANSWER = "#"  # 送分或無法辨識的答案，與 ANSWER_PROMPT 的約定相同
+
+_ANSWER_CHARS = re.compile(r"[A-E#]")
+_QUESTION_COUNT = re.compile(r"題\s*數\s*[:：]\s*(\d+)")
+_NOTE = re.compile(r"備\s*註\s*[:：](.*)", re.DOTALL)
+_NOTE_CLAUSE = re.compile(r"第\s*([\d\s、,，及和]+?)\s*題([^第]*)")
+
+
+class AnswerSheetError(ValueError):
+    """
+    答案卷不是可解析的標準答案表格
+    """
+
+
+def normalize(text: str) -> str:
+    """
+    全形字母、數字與 ＃ 轉為半形（NFKC），並移除空白
+    """
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text))
+
+
+def group_rows(words: list[dict]) -> list[list[dict]]:
+    """
+    依 top 將文字分列，每列依 x0 排序，列依 top 由上到下排序
+    """
+    rows = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if rows and abs(word["top"] - rows[-1][0]["top"]) <= ROW_TOLERANCE:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    return [sorted(row, key=lambda w: w["x0"]) for row in rows]
+
+
+def split_label(row: list[dict]) -> tuple[str, list[dict]]:
+    """
+    取得列開頭的標籤（例如「題號」，「題 號」分成兩個文字時也會合併）與其後的儲存格
+    """
+    label = ""
+    for index, word in enumerate(row[:2]):
+        label += normalize(word["text"])
+        if label in NUMBER_LABELS or label == ANSWER_LABEL:
+            return label, row[index + 1 :]
+    return None, row
+
+
+def _center(word: dict) -> float:
+    return (word["x0"] + word["x1"]) / 2
+
+
+def read_table(rows: list[list[dict]]) -> dict[int, str]:
+    """
+    將每個「題號」列與其下方第一個「答案」列的儲存格依水平位置配對
+
+    Returns:
+        dict[int, str]: {題號: 答案文字}，答案為同一欄中所有字母依序合併
+    """
+    answers = {}
+    labeled = [split_label(row) for row in rows]
+    for index, (label, cells) in enumerate(labeled):
+        if label not in NUMBER_LABELS or not cells:
+            continue
+        numbers = []
+        for cell in cells:
+            text = normalize(cell["text"])
+            if not text.isdigit():
+                raise AnswerSheetError(f"題號列中有非數字的儲存格：{cell['text']}")
+            numbers.append((int(text), _center(cell)))
+
+        answer_cells = next(
+            (
+                cells_below
+                for label_below, cells_below in labeled[index + 1 :]
+                if label_below == ANSWER_LABEL
+            ),
+            None,
+        )
+        if answer_cells is None:
+            raise AnswerSheetError(f"第 {numbers[0][0]} 題起的題號列下方沒有答案列")
+
+        # 同一欄的答案與題號的水平距離不超過相鄰兩欄距離的一半
+        gaps = [b[1] - a[1] for a, b in zip(numbers, numbers[1:])]
+        tolerance = min(gaps) / 2 if gaps else 10
+        row_answers = {number: "" for number, _ in numbers}
+        for cell in answer_cells:
+            number, distance = min(
+                ((number, abs(center - _center(cell))) for number, center in numbers),
+                key=lambda item: item[1],
+            )
+            if distance > tolerance:
+                raise AnswerSheetError(f"無法對應答案儲存格：{cell['text']}")
+            row_answers[number] += normalize(cell["text"])
+        missing = [str(number) for number, answer in row_answers.items() if not answer]
+        if missing:
+            raise AnswerSheetError(f"題號沒有對應的答案：{', '.join(missing)}")
+        answers.update(row_answers)
+    return answers
+
+
+def parse_notes(text: str) -> dict[int, str]:
+    """
+    解析備註中的更正答案，例如「第32題答Ｂ、Ｃ給分」、「第8題答案更正為Ａ」或「第5、7題一律給分」
+
+    Returns:
+        dict[int, str]: {題號: 更正後的答案}，一律給分者為 GIVEN_ANSWER
+    """
+    match = _NOTE.search(text)
+    if not match:
+        return {}
+    corrections = {}
+    for numbers, body in _NOTE_CLAUSE.findall(normalize(match.group(1))):
+        if "一律給分" in body or "送分" in body:
+            answer = GIVEN_ANSWER
+        elif "給分" in body:
+            answer = "".join(re.findall(r"[A-E]", body.split("給分")[0]))
+        elif "更正為" in body:
+            answer = "".join(re.findall(r"[A-E]", body.split("更正為")[1]))
+        else:
+            continue
+        if not answer:
+            continue
+        for number in re.findall(r"\d+", numbers):
+            corrections[int(number)] = answer
+    return corrections
+
+
+def to_answer(cell: str) -> str:
+    """
+    將答案儲存格轉為 PreAnswerItem 的 answer：字母依序合併（例如 BC），含 # 時為 #
+    """
+    chars = _ANSWER_CHARS.findall(cell)
+    if not chars or GIVEN_ANSWER in chars:
+        return GIVEN_ANSWER
+    return "".join(chars)
+
+
+def parse_answer_sheet(pdf) -> list[dict]:
+    """
+    解析標準答案 PDF
+
+    Args:
+        pdf (str | bytes): PDF 檔案路徑或內容
+
+    Returns:
+        list[dict]: [{"no": 題號, "answer": 答案}]，依題號排序
+
+    Raises:
+        AnswerSheetError: 找不到完整的題號／答案表格
+    """
+    source = io.BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else pdf
+    try:
+        with pdfplumber.open(source) as document:
+            table = {}
+            text = ""
+            for page in document.pages:
+                table.update(read_table(group_rows(page.extract_words())))
+                text += (page.extract_text() or "") + "\n"
+    except AnswerSheetError:
+        raise
+    except Exception as e:
+        raise AnswerSheetError(f"無法讀取 PDF：{e}") from e
+
+    if not table:
+        raise AnswerSheetError("找不到題號／答案表格")
+    numbers = sorted(table)
+    if numbers != list(range(1, len(numbers) + 1)):
+        raise AnswerSheetError(
+            f"題號不連續：{numbers[0]} ~ {numbers[-1]}，共 {len(numbers)} 題"
+        )
+    count = _QUESTION_COUNT.search(text)
+    if count and int(count.group(1)) != len(numbers):
+        raise AnswerSheetError(
+            f"題數欄位為 {count.group(1)} 題，表格中有 {len(numbers)} 題"
+        )
+
+    answers = {number: to_answer(cell) for number, cell in table.items()}
+    for number, answer in parse_notes(text).items():
+        if number in answers:
+            answers[number] = answer
+    return [{"no": number, "answer": answers[number]} for number in numbers]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以表格座標解析標準答案 PDF")
+    parser.add_argument("pdf_files", nargs="+")
+    args = parser.parse_args()
+
+    for pdf_file in args.pdf_files:
+        try:
+            items = parse_answer_sheet(pdf_file)
+        except AnswerSheetError as e:
+            print(f"{pdf_file}: 無法解析：{e}")
+            continue
+        print(f"{pdf_file}: {len(items)} 題")
+        print(" ".join(f"{item['no']}:{item['answer']}" for item in items))
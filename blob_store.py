@@ -0,0 +1,187 @@
+"""
+以內容 hash 定址的 PDF 儲存區（content-addressed blob store）
+
+url.csv 中有許多列指向同一份 PDF（例如多個類科共用的答案或國文試題），
+dl.py 會以各自的 {考試代碼}_{類科代碼}_{節次}_Q.pdf 檔名各存一份。
+本模組將實際內容依 sha256 存放於 question_bank/.blobs/ab/<sha256>.pdf，
+原本的檔名改為指向 blob 的 hard link，內容相同的 PDF 在磁碟上只存一份，
+而既有程式仍可直接以原檔名開啟。
+
+主要功能包括：
+1. ingest：將檔案搬進儲存區並以 hard link 取代原檔
+2. content_hash：由檔名查出內容 hash，供下游以 hash 為 key 避免重複解析
+3. dedupe_folder：將既有的 question_bank 一次轉換為去重後的結構
+4. gc：移除已沒有任何檔名參照的 blob
+
+使用方式：
+    python blob_store.py dedupe question_bank
+    python blob_store.py gc
+"""
+
+import argparse
+import logging
+import os
+import threading
+
+from download_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOB_DIR = os.path.join("question_bank", ".blobs")
+
+
+class BlobStore:
+    """
+    以 sha256 為 key 的 PDF 儲存區
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._inode_index = None  # (st_dev, st_ino) -> sha256，第一次查詢時建立
+
+    def blob_path(self, sha256: str) -> str:
+        """
+        回傳 blob 的存放路徑，以 hash 前兩碼分層避免單一資料夾檔案過多
+        """
+        return os.path.join(self.root, sha256[:2], f"{sha256}.pdf")
+
+    def ingest(self, path: str, sha256: str = None) -> str:
+        """
+        將檔案納入儲存區，並把原檔換成指向 blob 的 hard link
+
+        Args:
+            path (str): 要納入的檔案路徑
+            sha256 (str): 已知的內容 hash（例如下載時已計算），未提供則重新計算
+
+        Returns:
+            str: 檔案內容的 sha256
+        """
+        sha256 = sha256 or file_sha256(path)
+        blob = self.blob_path(sha256)
+
+        with self._lock:
+            if os.path.exists(blob):
+                if os.path.samefile(blob, path):
+                    return sha256
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(path, blob)
+            self._link(blob, path)
+            if self._inode_index is not None:
+                stat = os.stat(blob)
+                self._inode_index[(stat.st_dev, stat.st_ino)] = sha256
+        return sha256
+
+    def _link(self, blob: str, path: str):
+        """
+        以 hard link 將 path 指向 blob；檔案系統不支援時改用 symlink，再不行就複製
+        """
+        tmp_path = f"{path}.link"
+        try:
+            os.link(blob, tmp_path)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(blob), tmp_path)
+            except OSError:
+                with open(blob, "rb") as src, open(tmp_path, "wb") as dst:
+                    dst.write(src.read())
+        os.replace(tmp_path, path)
+
+    def _build_inode_index(self) -> dict:
+        index = {}
+        if not os.path.isdir(self.root):
+            return index
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    index[(stat.st_dev, stat.st_ino)] = entry.name[:-4]
+        return index
+
+    def content_hash(self, path: str) -> str:
+        """
+        取得檔案內容的 sha256
+
+        已納入儲存區的檔案直接由 inode 查出 hash，不需重新讀取整個檔案。
+        """
+        with self._lock:
+            if self._inode_index is None:
+                self._inode_index = self._build_inode_index()
+            stat = os.stat(path)
+            sha256 = self._inode_index.get((stat.st_dev, stat.st_ino))
+        return sha256 or file_sha256(path)
+
+    def dedupe_folder(self, folder: str) -> tuple[int, int]:
+        """
+        將資料夾中既有的 PDF 全部納入儲存區
+
+        Returns:
+            tuple[int, int]: (處理的檔案數, 省下的位元組數)
+        """
+        files = 0
+        saved = 0
+        for entry in os.scandir(folder):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if not entry.name.lower().endswith(".pdf"):
+                continue
+            size = entry.stat().st_size
+            sha256 = self.content_hash(entry.path)
+            blob = self.blob_path(sha256)
+            duplicated = os.path.exists(blob) and not os.path.samefile(blob, entry.path)
+            self.ingest(entry.path, sha256)
+            files += 1
+            if duplicated:
+                saved += size
+        logger.info(
+            f"{folder}: 處理 {files} 個檔案，省下 {saved / (1024 * 1024):.1f} MB"
+        )
+        return files, saved
+
+    def gc(self) -> int:
+        """
+        移除沒有任何檔名參照的 blob（hard link 數為 1）
+
+        以 symlink 或複製方式參照的 blob 無法由 link 數判斷，這種環境請勿執行。
+
+        Returns:
+            int: 移除的 blob 數
+        """
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        with self._lock:
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.stat().st_nlink == 1:
+                        os.remove(entry.path)
+                        removed += 1
+            self._inode_index = None
+        logger.info(f"移除 {removed} 個未被參照的 blob")
+        return removed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="以內容 hash 定址的 PDF 儲存區")
+    parser.add_argument("--root", default=DEFAULT_BLOB_DIR, help="blob 存放目錄")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dedupe_parser = subparsers.add_parser("dedupe", help="將既有的 PDF 納入儲存區")
+    dedupe_parser.add_argument("folder", nargs="?", default="question_bank")
+    subparsers.add_parser("gc", help="移除未被參照的 blob")
+    args = parser.parse_args()
+
+    store = BlobStore(args.root)
+    if args.command == "dedupe":
+        store.dedupe_folder(args.folder)
+    else:
+        store.gc()
@@ -0,0 +1,167 @@
+"""
+下載清單（download manifest）
+
+以 SQLite 記錄每個網址最後一次下載的結果，讓 downloader.py 重新執行時可以：
+1. 直接略過本機已存在且未變動的檔案
+2. 以條件式 GET（If-None-Match / If-Modified-Since）向伺服器確認檔案是否更新
+
+每筆記錄以（url, 存檔路徑）為 key，包含檔案大小、sha256、ETag、Last-Modified 與下載時間。
+同一個網址被多列引用、存成不同檔名時各有一筆記錄，不會互相覆蓋而每次都重新下載。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+DEFAULT_MANIFEST_PATH = "download_manifest.db"
+
+_TABLE_SCHEMA = """downloads (
+    url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (url, path)
+)"""
+
+
+@dataclass
+class ManifestEntry:
+    """單一網址存到單一路徑的下載記錄"""
+
+    url: str
+    path: str
+    size: int
+    sha256: str
+    etag: str = None
+    last_modified: str = None
+    fetched_at: float = None
+
+    def matches_local_file(self, path: str) -> bool:
+        """
+        檢查本機檔案是否仍為記錄中的版本（路徑相同且大小一致）
+        """
+        return (
+            self.path == path
+            and os.path.exists(path)
+            and os.path.getsize(path) == self.size
+        )
+
+    def conditional_headers(self) -> dict:
+        """
+        產生條件式 GET 所需的 header
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    計算檔案的 sha256
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """
+    以 SQLite 儲存的下載清單
+
+    downloader 會從多個 thread 同時讀寫，因此共用一條連線並以 lock 保護。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_MANIFEST_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate_url_key()
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {_TABLE_SCHEMA}")
+        self._conn.commit()
+
+    def _migrate_url_key(self):
+        """
+        舊版清單只以 url 為 key，改名後由新表格沿用其中的記錄
+        """
+        primary_keys = [
+            row[1]
+            for row in self._conn.execute("PRAGMA table_info(downloads)")
+            if row[5]
+        ]
+        if primary_keys != ["url"]:
+            return
+        self._conn.execute("ALTER TABLE downloads RENAME TO downloads_url_key")
+        self._conn.execute(f"CREATE TABLE {_TABLE_SCHEMA}")
+        self._conn.execute(
+            "INSERT INTO downloads SELECT url, path, size, sha256, etag, "
+            "last_modified, fetched_at FROM downloads_url_key"
+        )
+        self._conn.execute("DROP TABLE downloads_url_key")
+        self._conn.commit()
+
+    def get(self, url: str, path: str) -> ManifestEntry:
+        """
+        取得網址存到 path 的下載記錄，不存在則回傳 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, path, size, sha256, etag, last_modified, fetched_at "
+                "FROM downloads WHERE url = ? AND path = ?",
+                (url, path),
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def record(self, entry: ManifestEntry):
+        """
+        新增或更新一筆下載記錄，未指定 fetched_at 時以目前時間記錄
+        """
+        if entry.fetched_at is None:
+            entry.fetched_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads "
+                "(url, path, size, sha256, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.url,
+                    entry.path,
+                    entry.size,
+                    entry.sha256,
+                    entry.etag,
+                    entry.last_modified,
+                    entry.fetched_at,
+                ),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str, path: str):
+        """
+        伺服器回應 304 時，只更新確認時間
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE downloads SET fetched_at = ? WHERE url = ? AND path = ?",
+                (time.time(), url, path),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,575 @@
+"""
+考卷 PDF 並行下載器
+
+取代 dl.py / dl_101010.py 逐檔呼叫 curl 的作法，改為在同一個 process 內以
+requests.Session 的 keep-alive 連線池搭配 thread pool 並行下載。
+
+主要功能包括：
+1. 沿用原本 curl 的 header 設定
+2. 可設定的 worker 數量與連線池上限（pool_block=True，連線數不會超過上限）
+3. 下載完成後回報吞吐量（files/s、MB/s）
+4. 搭配 download_manifest.py 記錄下載結果，重新執行時略過未變動的檔案，
+   或以條件式 GET（If-None-Match / If-Modified-Since）重新確認
+5. 搭配 blob_store.py 將內容相同的 PDF 只存一份，原檔名改為 hard link
+6. benchmark 模式：在本機啟動替身 HTTP server，量測不同 worker/連線數的效能
+
+refresh 模式：
+- skip：清單中已有記錄且本機檔案大小相符就直接略過，不連線
+- revalidate：清單中已有記錄時送出條件式 GET，伺服器回應 304 則不重新下載
+- force：一律重新下載
+
+使用方式：
+    python downloader.py --csv url.csv --workers 16 --max-connections 16
+    python downloader.py --refresh skip
+    python downloader.py --bench --files 500 --size-kb 150
+"""
+
+import argparse
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from blob_store import BlobStore
+from download_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    DownloadManifest,
+    ManifestEntry,
+    file_sha256,
+)
+
+logger = logging.getLogger(__name__)
+
+# 定義要加入的 header 參數（與原本 curl -H 使用的內容相同）
+HEADERS = [
+    "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng",
+    "Accept-Language: zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Cache-Control: no-cache",
+    "Connection: keep-alive",
+    "Pragma: no-cache",
+    "Sec-Fetch-Dest: document",
+    "Sec-Fetch-Mode: navigate",
+    "Sec-Fetch-Site: none",
+    "Sec-Fetch-User: ?1",
+    "Upgrade-Insecure-Requests: 1",
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    'sec-ch-ua: "Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
+    "sec-ch-ua-mobile: ?0",
+    'sec-ch-ua-platform: "Linux"',
+]
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+PROGRESS_EVERY = 200  # 每完成幾個檔案輸出一次進度
+REFRESH_MODES = ("skip", "revalidate", "force")
+PDF_MAGIC = b"%PDF-"
+
+
+class NotPdfError(Exception):
+    """
+    伺服器以 200 回應，但內容不是 PDF（例如 HTML 錯誤頁或維護頁面）
+    """
+
+
+@dataclass
+class DownloadTask:
+    """單一下載工作：來源網址與存檔路徑"""
+
+    url: str
+    path: str
+    label: str = "檔案"
+    # 一律重新下載，不沿用清單記錄或本機檔案（例如 url_sync 偵測到網址已變動的列）
+    force: bool = False
+
+
+@dataclass
+class DownloadStats:
+    """下載統計，用於回報吞吐量"""
+
+    files: int = 0
+    skipped: int = 0
+    not_modified: int = 0
+    failed: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        done = self.files + self.skipped + self.not_modified
+        return done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"下載 {self.files} 個檔案，略過 {self.skipped} 個，"
+            f"未變動(304) {self.not_modified} 個，失敗 {self.failed} 個，"
+            f"共 {self.bytes / (1024 * 1024):.1f} MB，耗時 {self.elapsed:.1f} 秒，"
+            f"{self.files_per_second:.1f} files/s，{self.mb_per_second:.2f} MB/s"
+        )
+
+
+def headers_to_dict(headers: list[str]) -> dict:
+    """
+    將 curl 格式的 header 字串（"Name: value"）轉換為 requests 使用的 dict
+    """
+    result = {}
+    for h in headers:
+        name, _, value = h.partition(":")
+        result[name.strip()] = value.strip()
+    return result
+
+
+def create_session(max_connections: int = DEFAULT_MAX_CONNECTIONS) -> requests.Session:
+    """
+    建立共用的 requests.Session
+
+    同一個 host 最多保持 max_connections 條 keep-alive 連線，連線用完時其他
+    thread 會等待（pool_block=True），避免對考選部網站開出過多連線。
+
+    Args:
+        max_connections (int): 連線池上限
+
+    Returns:
+        requests.Session: 已掛上連線池與預設 header 的 session
+    """
+    session = requests.Session()
+    session.headers.update(headers_to_dict(HEADERS))
+
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=max_connections,
+        pool_maxsize=max_connections,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_pdf_filename(
+    exam_code: str, category_code: str, session: str, kind: str
+) -> str:
+    """
+    依照 dl.py 的命名規則產生 PDF 檔名，kind 為 "Q"（試題）或 "A"（答案）
+    """
+    return f"{exam_code}_{category_code}_{session}_{kind}.pdf"
+
+
+def tasks_from_csv(csv_file_path: str, folder: str) -> list[DownloadTask]:
+    """
+    讀取 url.csv，產生所有試題與答案的下載工作
+
+    Args:
+        csv_file_path (str): url.csv 的路徑
+        folder (str): PDF 存放目錄（question_bank）
+
+    Returns:
+        list[DownloadTask]: 下載工作列表
+    """
+    tasks = []
+    with open(csv_file_path, mode="r", encoding="utf-8") as file:
+        csv_reader = csv.reader(file)
+        next(csv_reader)  # 讀取標題列並略過
+
+        for row in csv_reader:
+            exam_code = row[1].strip('"')
+            category_code = row[6].strip('"')
+            session = row[8].strip('"')
+            question_url = row[11].strip('"')
+            answer_url = row[12].strip('"')
+
+            if question_url:
+                filename = build_pdf_filename(exam_code, category_code, session, "Q")
+                tasks.append(
+                    DownloadTask(question_url, os.path.join(folder, filename), "試題")
+                )
+            if answer_url:
+                filename = build_pdf_filename(exam_code, category_code, session, "A")
+                tasks.append(
+                    DownloadTask(answer_url, os.path.join(folder, filename), "答案")
+                )
+    return tasks
+
+
+def looks_like_pdf(path: str) -> bool:
+    """
+    檢查本機檔案是否存在、大小不為 0 且以 %PDF- 開頭
+    """
+    try:
+        if os.path.getsize(path) == 0:
+            return False
+        with open(path, "rb") as f:
+            return f.read(len(PDF_MAGIC)) == PDF_MAGIC
+    except OSError:
+        return False
+
+
+def adopt_existing_file(
+    session: requests.Session,
+    task: DownloadTask,
+    timeout: float,
+    manifest: DownloadManifest,
+    refresh: str,
+    blob_store: BlobStore = None,
+) -> bool:
+    """
+    將清單建立前就已下載的檔案加入清單
+
+    skip 模式直接以本機檔案建立記錄；revalidate 模式則先送 HEAD 取得
+    ETag/Last-Modified，且 Content-Length 與本機大小一致時才採用。
+
+    Returns:
+        bool: 是否已採用本機檔案（不需重新下載）
+    """
+    # 不是 PDF 的檔案（例如之前存下的錯誤頁）不可納入儲存區，否則會被 hard link 到其他檔名
+    if not looks_like_pdf(task.path):
+        return False
+    size = os.path.getsize(task.path)
+    etag = None
+    last_modified = None
+
+    if refresh == "revalidate":
+        response = session.head(task.url, timeout=timeout, allow_redirects=True)
+        if response.status_code != 200:
+            return False
+        content_length = response.headers.get("Content-Length")
+        if content_length is None or int(content_length) != size:
+            return False
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    sha256 = file_sha256(task.path)
+    if blob_store is not None:
+        blob_store.ingest(task.path, sha256)
+    manifest.record(
+        ManifestEntry(
+            url=task.url,
+            path=task.path,
+            size=size,
+            sha256=sha256,
+            etag=etag,
+            last_modified=last_modified,
+        )
+    )
+    return True
+
+
+def download_file(
+    session: requests.Session,
+    task: DownloadTask,
+    timeout: float = DEFAULT_TIMEOUT,
+    manifest: DownloadManifest = None,
+    refresh: str = "revalidate",
+    blob_store: BlobStore = None,
+) -> tuple[str, int]:
+    """
+    下載單一檔案
+
+    先寫入 {path}.part，完成後再以 os.replace 換成正式檔名，
+    避免中斷時留下不完整的 PDF；既有檔名是指向 blob 的 hard link 時，
+    os.replace 只會換掉這個檔名，不會寫穿共用的 blob。
+    存檔路徑為 .pdf 但回應內容不是以 %PDF- 開頭時丟出 NotPdfError，
+    暫存檔會被刪除，不會寫入正式檔名、儲存區或清單。有傳入 manifest 時會依 refresh 模式
+    略過或條件式重新確認已下載過的檔案；有傳入 blob_store 時，下載完成的檔案
+    會納入儲存區，內容重複的 PDF 只保留一份。
+
+    Returns:
+        tuple[str, int]: (狀態, 下載的位元組數)，狀態為
+            "downloaded"、"skipped" 或 "not_modified"
+
+    Raises:
+        NotPdfError: 回應內容不是 PDF
+    """
+    request_headers = {}
+    if manifest is not None and refresh != "force" and not task.force:
+        entry = manifest.get(task.url, task.path)
+        if entry and entry.matches_local_file(task.path):
+            if refresh == "skip":
+                return "skipped", 0
+            request_headers = entry.conditional_headers()
+        elif entry is None and looks_like_pdf(task.path):
+            if adopt_existing_file(
+                session, task, timeout, manifest, refresh, blob_store
+            ):
+                return "skipped", 0
+
+    download_dir = os.path.dirname(task.path)
+    if download_dir:
+        os.makedirs(download_dir, exist_ok=True)
+
+    tmp_path = f"{task.path}.part"
+    size = 0
+    digest = hashlib.sha256()
+    head = b""  # 回應內容的開頭，用於檢查 %PDF-
+    with session.get(
+        task.url, headers=request_headers, stream=True, timeout=timeout
+    ) as response:
+        if response.status_code == 304:
+            manifest.touch(task.url, task.path)
+            return "not_modified", 0
+
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                if len(head) < len(PDF_MAGIC):
+                    head += chunk[: len(PDF_MAGIC) - len(head)]
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    if task.path.lower().endswith(".pdf") and head != PDF_MAGIC:
+        os.remove(tmp_path)
+        raise NotPdfError(
+            f"回應內容不是 PDF（{size} bytes，開頭為 {head!r}）: {task.url}"
+        )
+    os.replace(tmp_path, task.path)
+
+    if blob_store is not None:
+        blob_store.ingest(task.path, digest.hexdigest())
+    if manifest is not None:
+        manifest.record(
+            ManifestEntry(
+                url=task.url,
+                path=task.path,
+                size=size,
+                sha256=digest.hexdigest(),
+                etag=etag,
+                last_modified=last_modified,
+            )
+        )
+    return "downloaded", size
+
+
+def download_all(
+    tasks: list[DownloadTask],
+    workers: int = DEFAULT_WORKERS,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    timeout: float = DEFAULT_TIMEOUT,
+    session: requests.Session = None,
+    manifest: DownloadManifest = None,
+    refresh: str = "revalidate",
+    blob_store: BlobStore = None,
+) -> DownloadStats:
+    """
+    以 thread pool 並行下載所有工作
+
+    Args:
+        tasks (list[DownloadTask]): 下載工作列表
+        workers (int): 同時進行的下載數
+        max_connections (int): 連線池上限
+        timeout (float): 單一請求的逾時秒數
+        session (requests.Session): 可自行傳入 session，未傳入則自動建立
+        manifest (DownloadManifest): 下載清單，未傳入則每次都完整下載
+        refresh (str): skip / revalidate / force，見模組說明
+        blob_store (BlobStore): 內容定址儲存區，未傳入則照原檔名各存一份
+
+    Returns:
+        DownloadStats: 下載統計
+    """
+    if refresh not in REFRESH_MODES:
+        raise ValueError(f"未知的 refresh 模式: {refresh}")
+
+    stats = DownloadStats()
+    lock = threading.Lock()
+    own_session = session is None
+    if own_session:
+        session = create_session(max_connections)
+
+    logger.info(
+        f"開始下載 {len(tasks)} 個檔案，workers={workers}，"
+        f"max_connections={max_connections}，refresh={refresh if manifest is not None else '-'}"
+    )
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    download_file,
+                    session,
+                    task,
+                    timeout,
+                    manifest,
+                    refresh,
+                    blob_store,
+                ): task
+                for task in tasks
+            }
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    status, size = future.result()
+                except Exception as e:
+                    logger.error(
+                        f"下載{task.label}失敗: {task.url} -> {task.path}: {e}"
+                    )
+                    with lock:
+                        stats.failed += 1
+                    continue
+
+                logger.debug(f"{status} {task.label}: {task.url} -> {task.path}")
+                with lock:
+                    if status == "skipped":
+                        stats.skipped += 1
+                    elif status == "not_modified":
+                        stats.not_modified += 1
+                    else:
+                        stats.files += 1
+                        stats.bytes += size
+                    done = stats.files + stats.skipped + stats.not_modified
+                    done += stats.failed
+                if done % PROGRESS_EVERY == 0:
+                    stats.elapsed = time.perf_counter() - start
+                    logger.info(f"進度 {done}/{len(tasks)}：{stats.summary()}")
+    finally:
+        if own_session:
+            session.close()
+
+    stats.elapsed = time.perf_counter() - start
+    logger.info(stats.summary())
+    return stats
+
+
+class _BenchHandler(BaseHTTPRequestHandler):
+    """benchmark 用的替身 server：任何路徑都回傳固定大小的假 PDF"""
+
+    protocol_version = "HTTP/1.1"  # 支援 keep-alive
+    payload = b""
+    etag = '"bench"'
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def benchmark(
+    files: int = 200,
+    size_kb: int = 150,
+    workers: int = DEFAULT_WORKERS,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+) -> tuple[DownloadStats, DownloadStats]:
+    """
+    在本機啟動替身 HTTP server 並量測下載吞吐量
+
+    先完整下載一次（冷啟動），再以 revalidate 模式重跑一次，
+    量測清單生效後條件式 GET 的效能。
+
+    Args:
+        files (int): 下載檔案數
+        size_kb (int): 每個檔案大小（KB），預設接近題庫 PDF 的平均大小
+        workers (int): 同時進行的下載數
+        max_connections (int): 連線池上限
+
+    Returns:
+        tuple[DownloadStats, DownloadStats]: (冷啟動, revalidate) 的下載統計
+    """
+    handler = type(
+        "BenchHandler",
+        (_BenchHandler,),
+        {"payload": b"%PDF-1.4\n" + os.urandom(size_kb * 1024)},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tasks = [
+                DownloadTask(f"{base_url}/{i}.pdf", os.path.join(tmp_dir, f"{i}.pdf"))
+                for i in range(files)
+            ]
+            manifest = DownloadManifest(os.path.join(tmp_dir, "manifest.db"))
+            try:
+                cold = download_all(tasks, workers, max_connections, manifest=manifest)
+                warm = download_all(tasks, workers, max_connections, manifest=manifest)
+            finally:
+                manifest.close()
+            return cold, warm
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="考卷 PDF 並行下載器")
+    parser.add_argument("--csv", default="url.csv", help="url.csv 路徑")
+    parser.add_argument("--folder", default="question_bank", help="PDF 存放目錄")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument(
+        "--manifest", default=DEFAULT_MANIFEST_PATH, help="下載清單路徑"
+    )
+    parser.add_argument("--refresh", choices=REFRESH_MODES, default="revalidate")
+    parser.add_argument(
+        "--bench", action="store_true", help="對本機替身 server 做 benchmark"
+    )
+    parser.add_argument("--files", type=int, default=200, help="benchmark 檔案數")
+    parser.add_argument("--size-kb", type=int, default=150, help="benchmark 檔案大小")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.files, args.size_kb, args.workers, args.max_connections)
+    else:
+        manifest = DownloadManifest(args.manifest)
+        try:
+            download_all(
+                tasks_from_csv(args.csv, args.folder),
+                args.workers,
+                args.max_connections,
+                args.timeout,
+                manifest=manifest,
+                refresh=args.refresh,
+            )
+        finally:
+            manifest.close()
@@ -0,0 +1,343 @@
+"""
+考試目錄（exam catalog）
+
+取代 work.ipynb 中「把 question_json_all 全部讀進 fse_all.json 再用 for 迴圈篩選」的作法，
+改以 SQLite 儲存每份考卷的 header（不含題庫），並在常用的篩選欄位上建立索引。
+
+主要功能包括：
+1. 增量建立：依 JSON 檔案的修改時間，只重新讀取有變動的檔案
+2. dl_101010.py / url_sync.py 建立 JSON 時同步寫入目錄
+3. Python API 與 CLI 查詢，並可將查詢結果複製到 question_json 以便進行 parsing
+
+使用方式：
+    python exam_catalog.py build question_json_all question_json_done
+    python exam_catalog.py query --group 醫師 --subject 醫學 --year-from 101 --year-to 103
+    python exam_catalog.py query --group 醫師 --year 101 --copy-to question_json
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = "exam_catalog.db"
+
+# JSON 欄位與資料表欄位的對照
+COLUMNS = {
+    "考試年度": "year",
+    "考試代碼": "exam_code",
+    "考試名稱": "exam_name",
+    "等級代碼": "level_code",
+    "等級分類": "level_category",
+    "考試及等別": "exam_level",
+    "類科代碼": "category_code",
+    "類科組別": "category_group",
+    "節次": "session",
+    "科目全名": "subject",
+    "試題型態": "question_type",
+    "試題網址": "question_url",
+    "試題檔案": "question_file",
+    "測驗式試題答案網址": "answer_url",
+    "測驗式試題答案檔案": "answer_file",
+    "備註": "remark",
+}
+
+INDEXED_COLUMNS = (
+    "year",
+    "exam_code",
+    "category_code",
+    "level_category",
+    "category_group",
+    "subject",
+)
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """
+    以範圍條件取代 LIKE 'prefix%'，讓 SQLite 可以使用索引
+
+    上界為最後一個字元加一（UTF-8 的位元組順序與字元碼順序相同），
+    以 prefix 開頭的 key 不論後面接什麼字元（包含 BMP 以外的字元）都小於上界。
+    最後一個字元已是 U+10FFFF 時去掉該字元再計算，全部都是時回傳 None（沒有上界）。
+    """
+    while prefix and ord(prefix[-1]) == 0x10FFFF:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # surrogate 無法編碼為 UTF-8，跳到下一個有效字元
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
+class ExamCatalog:
+    """
+    以 SQLite 儲存的考試目錄
+
+    可當作 context manager 使用，離開時會 commit 並關閉連線。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CATALOG_PATH):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        columns = ",\n".join(
+            f"{column} {'INTEGER' if column == 'year' else 'TEXT'}"
+            for column in COLUMNS.values()
+        )
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS exams (
+                id TEXT PRIMARY KEY,
+                {columns},
+                question_count INTEGER NOT NULL DEFAULT 0,
+                json_path TEXT,
+                mtime REAL,
+                header TEXT NOT NULL
+            );
+            """
+            + "".join(
+                f"CREATE INDEX IF NOT EXISTS idx_exams_{column} ON exams ({column});\n"
+                for column in INDEXED_COLUMNS
+            )
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM exams").fetchone()[0]
+
+    def upsert(self, exam_data: dict, json_path: str = None, mtime: float = None):
+        """
+        新增或更新一份考卷的 header，未 commit，需呼叫 commit() 或 close()
+
+        Args:
+            exam_data (dict): dl_101010.create_exam_json 產生的資料（可含題庫）
+            json_path (str): JSON 檔案路徑
+            mtime (float): JSON 檔案修改時間，供增量建立時比對
+        """
+        header = {k: v for k, v in exam_data.items() if k != "題庫"}
+        values = [header.get(key) for key in COLUMNS]
+        year = header.get("考試年度")
+        values[0] = int(year) if year and str(year).isdigit() else None
+
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO exams "
+            f"(id, {', '.join(COLUMNS.values())}, question_count, json_path, mtime, header) "
+            f"VALUES ({', '.join('?' * (len(COLUMNS) + 5))})",
+            [
+                header["id"],
+                *values,
+                len(exam_data.get("題庫") or []),
+                json_path,
+                mtime,
+                json.dumps(header, ensure_ascii=False),
+            ],
+        )
+
+    def build_from_dir(self, json_dir: str) -> int:
+        """
+        增量建立目錄：只讀取新增或修改時間有變動的 JSON
+
+        Args:
+            json_dir (str): 存放 fse JSON 的資料夾
+
+        Returns:
+            int: 本次新增或更新的筆數
+        """
+        known = {
+            row["json_path"]: row["mtime"]
+            for row in self._conn.execute("SELECT json_path, mtime FROM exams")
+        }
+
+        updated = 0
+        with os.scandir(json_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                mtime = entry.stat().st_mtime
+                if known.get(entry.path) == mtime:
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        exam_data = json.load(f)
+                    self.upsert(exam_data, entry.path, mtime)
+                    updated += 1
+                except (json.JSONDecodeError, KeyError) as e:
+                    logger.error(f"無法加入目錄: {entry.path}: {e}")
+        self.commit()
+        logger.info(f"{json_dir}: 新增或更新 {updated} 筆，目錄共 {len(self)} 筆")
+        return updated
+
+    def query(
+        self,
+        years: list[int] = None,
+        year_from: int = None,
+        year_to: int = None,
+        exam_code: str = None,
+        category_code: str = None,
+        level_category: str = None,
+        group_prefix: str = None,
+        subject_prefix: str = None,
+        subject_contains: str = None,
+        exam_name_contains: str = None,
+        unparsed_only: bool = False,
+        limit: int = None,
+    ) -> list[dict]:
+        """
+        查詢考卷 header，所有條件以 AND 組合
+
+        Args:
+            years (list[int]): 考試年度列表
+            year_from (int): 考試年度下限（含）
+            year_to (int): 考試年度上限（含）
+            exam_code (str): 考試代碼
+            category_code (str): 類科代碼
+            level_category (str): 等級分類
+            group_prefix (str): 類科組別開頭，例如 "醫師"
+            subject_prefix (str): 科目全名開頭
+            subject_contains (str): 科目全名包含的文字，例如 "醫學"
+            exam_name_contains (str): 考試名稱包含的文字
+            unparsed_only (bool): 只回傳題庫為空的考卷
+            limit (int): 最多回傳筆數
+
+        Returns:
+            list[dict]: 依 id 排序的考卷 header（含 json_path）
+        """
+        conditions = []
+        params = []
+        if years:
+            conditions.append(f"year IN ({', '.join('?' * len(years))})")
+            params.extend(int(y) for y in years)
+        if year_from is not None:
+            conditions.append("year >= ?")
+            params.append(int(year_from))
+        if year_to is not None:
+            conditions.append("year <= ?")
+            params.append(int(year_to))
+        for column, value in (
+            ("exam_code", exam_code),
+            ("category_code", category_code),
+            ("level_category", level_category),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        for column, prefix in (
+            ("category_group", group_prefix),
+            ("subject", subject_prefix),
+        ):
+            if prefix:
+                upper_bound = _prefix_upper_bound(prefix)
+                conditions.append(f"{column} >= ?")
+                params.append(prefix)
+                if upper_bound is not None:
+                    conditions.append(f"{column} < ?")
+                    params.append(upper_bound)
+        if subject_contains:
+            conditions.append("instr(subject, ?) > 0")
+            params.append(subject_contains)
+        if exam_name_contains:
+            conditions.append("instr(exam_name, ?) > 0")
+            params.append(exam_name_contains)
+        if unparsed_only:
+            conditions.append("question_count = 0")
+
+        sql = "SELECT header, json_path FROM exams"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        results = []
+        for row in self._conn.execute(sql, params):
+            header = json.loads(row["header"])
+            header["json_path"] = row["json_path"]
+            results.append(header)
+        return results
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="考試目錄")
+    parser.add_argument("--db", default=DEFAULT_CATALOG_PATH, help="目錄資料庫路徑")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="由 JSON 資料夾增量建立目錄")
+    build_parser.add_argument("folders", nargs="+", help="存放 fse JSON 的資料夾")
+
+    query_parser = subparsers.add_parser("query", help="查詢考卷")
+    query_parser.add_argument("--year", type=int, nargs="+", help="考試年度")
+    query_parser.add_argument("--year-from", type=int, help="考試年度下限")
+    query_parser.add_argument("--year-to", type=int, help="考試年度上限")
+    query_parser.add_argument("--exam-code", help="考試代碼")
+    query_parser.add_argument("--category-code", help="類科代碼")
+    query_parser.add_argument("--level", help="等級分類")
+    query_parser.add_argument("--group", help="類科組別開頭")
+    query_parser.add_argument("--subject-prefix", help="科目全名開頭")
+    query_parser.add_argument("--subject", help="科目全名包含的文字")
+    query_parser.add_argument("--exam-name", help="考試名稱包含的文字")
+    query_parser.add_argument(
+        "--unparsed", action="store_true", help="只列出題庫為空的考卷"
+    )
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument("--copy-to", help="將查詢結果的 JSON 複製到此資料夾")
+    args = parser.parse_args()
+
+    with ExamCatalog(args.db) as catalog:
+        if args.command == "build":
+            for folder in args.folders:
+                catalog.build_from_dir(folder)
+        else:
+            exams = catalog.query(
+                years=args.year,
+                year_from=args.year_from,
+                year_to=args.year_to,
+                exam_code=args.exam_code,
+                category_code=args.category_code,
+                level_category=args.level,
+                group_prefix=args.group,
+                subject_prefix=args.subject_prefix,
+                subject_contains=args.subject,
+                exam_name_contains=args.exam_name,
+                unparsed_only=args.unparsed,
+                limit=args.limit,
+            )
+            for exam in exams:
+                print(
+                    f"{exam['id']}\t{exam.get('考試年度')}\t{exam.get('類科組別')}\t"
+                    f"{exam.get('科目全名')}"
+                )
+            print(f"共 {len(exams)} 筆")
+
+            if args.copy_to:
+                os.makedirs(args.copy_to, exist_ok=True)
+                for exam in exams:
+                    if not exam["json_path"] or not os.path.exists(exam["json_path"]):
+                        print(f"找不到檔案: {exam['json_path']}")
+                        continue
+                    shutil.copy(exam["json_path"], args.copy_to)
+                print(f"已複製至 {args.copy_to}")
@@ -0,0 +1,181 @@
+"""
+本機的 Gemini API 替身 server
+
+回應 POST /v1beta/models/{model}:generateContent，依請求中的 responseSchema 產生假資料
+（最外層陣列產生 --items 個元素，內層陣列例如 choices 產生 4 個，整數欄位依序編號），
+並回傳 usageMetadata，
+可用來在不花費 token 的情況下測試 gemini_resolver 的並行、速率限制與預算處理。
+
+每個請求都會延遲 --latency 秒模擬模型生成時間；--fail-every N 則讓每第 N 個請求回傳 500。
+
+使用方式：
+    python fake_gemini.py --port 8765 --latency 5
+    GOOGLE_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8765 python gemini_resolver.py
+"""
+
+import argparse
+import base64
+import json
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_ITEMS = 80
+TOKENS_PER_PDF_PAGE = 258
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def fake_value(schema: dict, index: int, items: int):
+    """
+    依 responseSchema 產生一個假資料
+    """
+    schema_type = (schema.get("type") or "OBJECT").upper()
+    if schema_type == "ARRAY":
+        count = items if index == 0 else 4
+        return [fake_value(schema.get("items", {}), i + 1, items) for i in range(count)]
+    if schema_type == "OBJECT":
+        return {
+            name: fake_value(prop, index, items)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "INTEGER":
+        return index
+    if schema_type == "NUMBER":
+        return float(index)
+    if schema_type == "BOOLEAN":
+        return False
+    return f"fake {index}"
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    可設定延遲與失敗率的替身 server，記錄收到的請求數與同時處理中的最大請求數
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, items=DEFAULT_ITEMS, fail_every=0):
+        super().__init__(address, _FakeGeminiHandler)
+        self.latency = latency
+        self.items = items
+        self.fail_every = fail_every
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        with server._lock:
+            server.requests += 1
+            number = server.requests
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if server.fail_every and number % server.fail_every == 0:
+                self._send(500, {"error": {"code": 500, "message": "fake error"}})
+                return
+
+            config = body.get("generationConfig", {})
+            value = fake_value(config.get("responseSchema", {}), 0, server.items)
+            text = json.dumps(value, ensure_ascii=False)
+
+            prompt_tokens = 0
+            for content in body.get("contents", []):
+                for part in content.get("parts", []):
+                    if "inlineData" in part:
+                        encoded = part["inlineData"].get("data", "")
+                        # SDK 以 URL-safe base64 傳送，且可能省略結尾的 =
+                        data = base64.urlsafe_b64decode(
+                            encoded + "=" * (-len(encoded) % 4)
+                        )
+                        pages = max(len(_PDF_PAGE.findall(data)), 1)
+                        prompt_tokens += pages * TOKENS_PER_PDF_PAGE
+                    elif "text" in part:
+                        prompt_tokens += len(part["text"]) // 4
+            output_tokens = len(text) // 4
+            self._send(
+                200,
+                {
+                    "candidates": [
+                        {
+                            "content": {"role": "model", "parts": [{"text": text}]},
+                            "finishReason": "STOP",
+                        }
+                    ],
+                    "usageMetadata": {
+                        "promptTokenCount": prompt_tokens,
+                        "candidatesTokenCount": output_tokens,
+                        "totalTokenCount": prompt_tokens + output_tokens,
+                    },
+                },
+            )
+        finally:
+            with server._lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_server(
+    port: int = 0, latency: float = 0.0, items: int = DEFAULT_ITEMS, fail_every: int = 0
+) -> FakeGeminiServer:
+    """
+    在背景 thread 啟動替身 server，port 為 0 時使用任一可用的 port
+    """
+    server = FakeGeminiServer(("127.0.0.1", port), latency, items, fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="本機的 Gemini API 替身 server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的延遲秒數")
+    parser.add_argument(
+        "--items", type=int, default=DEFAULT_ITEMS, help="陣列回應的元素個數"
+    )
+    parser.add_argument(
+        "--fail-every", type=int, default=0, help="每第 N 個請求回傳 500，0 表示不失敗"
+    )
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(
+        ("127.0.0.1", args.port), args.latency, args.items, args.fail_every
+    )
+    logger.info(f"替身 server 已啟動：{server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
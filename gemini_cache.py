@@ -0,0 +1,222 @@
+"""
+Gemini 回應快取
+
+resolve_question_from_pdf 一次要花上萬個輸出 token，程式在題目卷解析完、JSON 寫回前中斷的話，
+下次執行又得重新付一次。本模組將 Gemini 的原始回應文字與 usage_metadata 以 gzip 壓縮的 JSON
+存在磁碟上，同一份 PDF 以相同的模型、prompt 與 response schema 再次解析時直接由快取讀取，
+不需呼叫 API，也不花費 token。
+
+快取 key 由 PDF 內容的 sha256、模型名稱、prompt 與 response schema（JSON Schema）組成：
+- PDF 內容相同（即使檔名不同）即可共用快取
+- 修改 prompt 或 schema（例如增加欄位）時舊的快取自然不會被使用
+
+快取總大小超過上限時，依最後使用時間（讀取時會更新檔案的 mtime）由舊到新刪除，
+直到總大小低於上限的 EVICT_RATIO。
+
+使用方式：
+    python gemini_cache.py stats
+    python gemini_cache.py evict --max-mb 256
+    python gemini_cache.py clear
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from pydantic import TypeAdapter
+
+DEFAULT_CACHE_DIR = ".gemini_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_RATIO = 0.9  # 淘汰時刪到總大小低於上限的這個比例
+
+
+def schema_fingerprint(schema) -> str:
+    """
+    將 response schema（例如 list[PreAnswerItem]）轉為固定順序的 JSON Schema 字串
+    """
+    return json.dumps(
+        TypeAdapter(schema).json_schema(), sort_keys=True, ensure_ascii=False
+    )
+
+
+class ResponseCache:
+    """
+    以 (PDF 內容 hash, 模型, prompt, schema) 為 key 的 Gemini 回應快取
+    """
+
+    def __init__(
+        self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Args:
+            root (str): 快取目錄
+            max_bytes (int): 快取總大小上限，None 表示不限制
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None  # 目前總大小，第一次寫入時掃描目錄取得
+
+    def cache_key(self, pdf_data: bytes, model: str, prompt: str, schema) -> str:
+        """
+        組合快取 key：PDF 內容 hash、模型名稱、prompt 與 response schema
+        """
+        raw = json.dumps(
+            [
+                hashlib.sha256(pdf_data).hexdigest(),
+                model,
+                prompt,
+                schema_fingerprint(schema),
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        """
+        回傳快取檔路徑，以 key 前兩碼分層避免單一資料夾檔案過多
+        """
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def get(self, key: str) -> dict:
+        """
+        讀取快取，不存在或無法讀取時回傳 None
+
+        Returns:
+            dict: {"model", "text", "usage": {"prompt", "candidates", "total"}, "created"}
+        """
+        path = self.entry_path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            print(f"快取檔損毀，將重新呼叫 API：{path}：{e}")
+            return None
+        # 更新最後使用時間，淘汰時以 mtime 判斷
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, model: str, text: str, usage_metadata) -> dict:
+        """
+        寫入 API 的原始回應文字與 token 用量，總大小超過上限時淘汰最久未使用的快取
+
+        Args:
+            usage_metadata: response.usage_metadata
+
+        Returns:
+            dict: 寫入的快取內容
+        """
+        entry = {
+            "model": model,
+            "text": text,
+            "usage": {
+                "prompt": getattr(usage_metadata, "prompt_token_count", None),
+                "candidates": getattr(usage_metadata, "candidates_token_count", None),
+                "total": getattr(usage_metadata, "total_token_count", None),
+            },
+            "created": time.time(),
+        }
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 暫存檔名每次都不同，同一個 process 的多個 thread 同時寫入同一個 key 也不會互相截斷
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f"{key}.", suffix=".part"
+        )
+        os.close(fd)
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+        if self.max_bytes is not None:
+            if self._size is None:
+                self._size = self.stats()[1]
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self.evict(self.max_bytes)
+        return entry
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            entries.extend(
+                entry
+                for entry in os.scandir(shard.path)
+                if entry.is_file() and entry.name.endswith(".json.gz")
+            )
+        return entries
+
+    def evict(self, max_bytes: int) -> int:
+        """
+        依最後使用時間由舊到新刪除快取，直到總大小低於 max_bytes * EVICT_RATIO
+
+        Returns:
+            int: 刪除的快取檔數
+        """
+        entries = [(entry.stat(), entry.path) for entry in self._entries()]
+        size = sum(stat.st_size for stat, _ in entries)
+        target = max_bytes * EVICT_RATIO
+        removed = 0
+        for stat, path in sorted(entries, key=lambda item: item[0].st_mtime):
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+            removed += 1
+        self._size = size
+        return removed
+
+    def stats(self) -> tuple[int, int]:
+        """
+        Returns:
+            tuple[int, int]: (快取檔數, 總位元組數)
+        """
+        entries = self._entries()
+        return len(entries), sum(entry.stat().st_size for entry in entries)
+
+    def clear(self):
+        """
+        清除所有快取
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._size = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini 回應快取")
+    parser.add_argument("--root", default=DEFAULT_CACHE_DIR, help="快取目錄")
+    parser.add_argument("command", choices=["stats", "evict", "clear"])
+    parser.add_argument(
+        "--max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="evict 時的快取總大小上限（MB）",
+    )
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.root)
+    if args.command == "stats":
+        files, size = cache.stats()
+        print(f"共 {files} 個快取檔，{size / (1024 * 1024):.1f} MB")
+    elif args.command == "evict":
+        removed = cache.evict(int(args.max_mb * 1024 * 1024))
+        print(f"已刪除 {removed} 個快取檔")
+    else:
+        cache.clear()
+        print(f"已清除 {args.root}")
@@ -0,0 +1,176 @@
+"""
+Gemini API 的速率限制與 token 預算
+
+gemini_resolver 以 asyncio 同時處理多份考卷時，所有請求共用同一個 RateLimiter 與 TokenBudget：
+
+1. RateLimiter：以 60 秒滑動視窗限制每分鐘請求數（RPM）與 token 數（TPM）。
+   送出請求前先以估計的 token 數預約額度，收到回應後再以 usage_metadata 的實際用量修正。
+2. TokenBudget：整次執行可使用的 token 總量。與 RateLimiter 相同，送出請求前先預約估計的 token 數，
+   已使用加上已預約（尚未回應）的用量會超過預算時不再送出新的請求；同時送出的請求不會都在
+   用量還是 0 時通過檢查。已送出的請求仍會完成並寫回結果。
+
+PDF 的輸入 token 以頁數估計（Gemini 每頁約 258 token），輸出 token 依請求種類給定預估值。
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+
+WINDOW_SECONDS = 60.0
+TOKENS_PER_PDF_PAGE = 258
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class TokenBudgetExceeded(Exception):
+    """
+    token 預算已用完
+    """
+
+
+def estimate_pdf_tokens(data: bytes) -> int:
+    """
+    以 PDF 中 /Type /Page 物件的數量估計輸入 token 數
+    """
+    return max(len(_PDF_PAGE.findall(data)), 1) * TOKENS_PER_PDF_PAGE
+
+
+@dataclass
+class Reservation:
+    """
+    RateLimiter 中一筆已預約的請求
+    """
+
+    started: float
+    tokens: int
+
+
+class RateLimiter:
+    """
+    每分鐘請求數與 token 數的滑動視窗限制
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None, clock=time.monotonic):
+        """
+        Args:
+            rpm (int): 每分鐘最多請求數，None 表示不限制
+            tpm (int): 每分鐘最多 token 數，None 表示不限制
+            clock: 取得目前時間的函數（秒）
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._clock = clock
+        self._window = deque()  # 視窗內的 Reservation，依 started 排序
+        self._lock = asyncio.Lock()
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0].started >= WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        """
+        再送出一個 tokens 大小的請求前需要等待的秒數，0 表示可以立即送出
+        """
+        if not self._window:
+            # 視窗為空時一律放行，單一請求超過 TPM 也不會永遠等待
+            return 0.0
+        wait = 0.0
+        if self.rpm is not None and len(self._window) >= self.rpm:
+            oldest = self._window[len(self._window) - self.rpm]
+            wait = max(wait, oldest.started + WINDOW_SECONDS - now)
+        if self.tpm is not None:
+            used = sum(item.tokens for item in self._window)
+            # 由最舊的請求開始移出視窗，直到剩下的用量足以容納這次請求
+            for item in self._window:
+                if used + tokens <= self.tpm:
+                    break
+                used -= item.tokens
+                wait = max(wait, item.started + WINDOW_SECONDS - now)
+        return wait
+
+    async def acquire(self, tokens: int) -> Reservation:
+        """
+        等到 RPM 與 TPM 都有額度後預約一次請求
+
+        Args:
+            tokens (int): 這次請求預估的 token 數
+        """
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    reservation = Reservation(now, tokens)
+                    self._window.append(reservation)
+                    return reservation
+                await asyncio.sleep(wait)
+
+    def settle(self, reservation: Reservation, tokens: int):
+        """
+        以實際用量修正預約的 token 數
+        """
+        reservation.tokens = tokens
+
+
+class TokenBudget:
+    """
+    整次執行的 token 預算
+    """
+
+    def __init__(self, limit: int = None):
+        """
+        Args:
+            limit (int): 可使用的 token 總量，None 表示不限制
+        """
+        self.limit = limit
+        self.spent = 0
+        self.reserved = 0  # 已送出但尚未回應的請求所預約的 token 數
+        self.requests = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.spent >= self.limit
+
+    def reserve(self, tokens: int) -> int:
+        """
+        送出請求前預約估計的 token 數
+
+        Args:
+            tokens (int): 這次請求預估的 token 數
+
+        Returns:
+            int: 預約的 token 數，收到回應後以 settle 改為實際用量，請求失敗時以 release 取消
+
+        Raises:
+            TokenBudgetExceeded: 已使用與已預約的用量加上這次請求會超過預算
+        """
+        if self.limit is not None and self.spent + self.reserved + tokens > self.limit:
+            raise TokenBudgetExceeded(
+                f"已使用 {self.spent} token、預約 {self.reserved} token，"
+                f"再送出約 {tokens} token 的請求會超過預算 {self.limit} token"
+            )
+        self.reserved += tokens
+        return tokens
+
+    def settle(self, reserved: int, tokens: int):
+        """
+        以實際用量取代預約的 token 數
+        """
+        self.reserved -= reserved
+        self.charge(tokens)
+
+    def release(self, reserved: int):
+        """
+        請求沒有完成時取消預約
+        """
+        self.reserved -= reserved
+
+    def charge(self, tokens: int):
+        """
+        記錄一次請求實際使用的 token 數
+        """
+        self.spent += tokens
+        self.requests += 1
@@ -1,4 +1,6 @@
 from dotenv import load_dotenv
+import argparse
+import asyncio
 import os
 import json
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -8,8 +10,22 @@ import pathlib
 from pydantic import BaseModel
 from typing import List
 from pathlib import Path
-import requests
 import logging
+from dataclasses import dataclass, field
+
+import answer_sheet
+import downloader
+import pdf_chunks
+from regular_expression_parser import engine, router
+from blob_store import BlobStore
+from download_manifest import DEFAULT_MANIFEST_PATH, DownloadManifest
+from gemini_cache import ResponseCache
+from gemini_limits import (
+    RateLimiter,
+    TokenBudget,
+    TokenBudgetExceeded,
+    estimate_pdf_tokens,
+)
 
 # 設定日誌記錄
 logging.basicConfig(
@@ -29,6 +45,46 @@ load_dotenv()
 model_name = "gemini-2.5-pro-exp-03-25"
 modle_name_for_answer = "gemini-2.0-flash"
 
+# 預估的輸出 token 數，用於 TPM 額度預約（實際用量以 usage_metadata 修正）
+QUESTION_OUTPUT_TOKENS = 16000
+ANSWER_OUTPUT_TOKENS = 2000
+
+DEFAULT_CONCURRENCY = 4  # 同時處理的考卷數
+MIN_QUESTION_COUNT = 20  # 題庫已有此數量以上的題目即視為處理過
+
+# 答案卷先以 answer_sheet 依表格座標在本機解析，無法解析時才送 Gemini（--gemini-answers 關閉）
+LOCAL_ANSWERS = True
+
+# 先以 regex parser 解析並檢查，未通過才送 Gemini（見 regular_expression_parser.router，--no-local 關閉）
+LOCAL_FIRST = True
+
+# 題目卷的 Prompt，指示AI模型如何解析PDF內容並轉換為特定格式
+QUESTION_PROMPT = """
+    Please recognize the content of the file and extract the content of the file, then recompose the content into json format,
+    the format should match MMLU Dataset format.
+    """
+
+# 題目卷切成多份平行解析時，每份附加在 QUESTION_PROMPT 之後的說明
+QUESTION_CHUNK_PROMPT = """
+    This file contains pages {start} to {end} of a {total}-page exam paper.
+    Use the question number printed in the paper as "no".
+    Include every question that appears in these pages, even if it is cut off at the first or last page.
+    """
+
+# 題目卷切成多份的頁數與重疊頁數，CHUNK_PAGES 為 0 時整份送出（--chunk-pages）
+CHUNK_PAGES = pdf_chunks.CHUNK_PAGES
+CHUNK_OVERLAP = pdf_chunks.CHUNK_OVERLAP
+
+# 答案卷的 Prompt，這裡特別指示模型只解析題號和答案，並符合PreAnswerItem格式
+ANSWER_PROMPT = """
+    Please recognize the content of the file and extract the content of the file, then recompose the content into json format,
+    you shold follow the rules below:
+    1. only parse the question number and answer, and the format should match PreAnswerItem format.
+    2. the question number should be in the format of "題號: 題目"
+    3. the answer should be in the format of "答案: 答案"
+    4. Just put # sign in the answer field if you recognize the answer is # or cannot recognize the answer.
+    """
+
 
 # genai is for direct call Google GenAI API
 # genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -52,7 +108,54 @@ class PreAnswerItem(BaseModel):
     answer: str
 
 
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+def create_client(base_url: str = None) -> genai.Client:
+    """
+    建立 Google GenAI client
+
+    Args:
+        base_url (str): API 端點，未指定則使用 Google 的端點；
+            測試時可指向 fake_gemini.py 的替身 server（或設定環境變數 GEMINI_BASE_URL）
+    """
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"), http_options=http_options)
+
+
+client = create_client(os.getenv("GEMINI_BASE_URL"))
+
+# Gemini 回應快取；REFRESH_CACHE 為 True（--refresh）時不讀取既有快取，但仍會寫入新的回應
+response_cache = ResponseCache()
+REFRESH_CACHE = False
+
+
+def load_cached_json(key: str) -> list:
+    """
+    由回應快取讀取解析結果，沒有快取或 REFRESH_CACHE 時回傳 None
+    """
+    if REFRESH_CACHE:
+        return None
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    logger.info(
+        f"使用快取的回應，未呼叫 API（原本使用 {entry['usage']['total']} token）"
+    )
+    return json.loads(entry["text"])
+
+
+def parse_answer_sheet_locally(data: bytes) -> list:
+    """
+    以 answer_sheet 在本機解析答案卷，LOCAL_ANSWERS 為 False 或無法解析時回傳 None
+    """
+    if not LOCAL_ANSWERS:
+        return None
+    try:
+        result = answer_sheet.parse_answer_sheet(data)
+    except answer_sheet.AnswerSheetError as e:
+        logger.warning(f"無法在本機解析答案卷，改用 Gemini：{e}")
+        return None
+    logger.info(f"成功在本機解析答案卷，共獲取 {len(result)} 個答案項目")
+    return result
+
 
 logger.info("初始化完成")
 
@@ -82,10 +185,15 @@ def resolve_question_from_pdf(file_path: str) -> list[PreMMLUDatasetItem]:
     logger.debug(f"完整檔案路徑: {file}")
 
     # 定義Prompt，指示AI模型如何解析PDF內容並轉換為特定格式
-    prompt = """
-    Please recognize the content of the file and extract the content of the file, then recompose the content into json format,
-    the format should match MMLU Dataset format.
-    """
+    prompt = QUESTION_PROMPT
+
+    data = file.read_bytes()
+    schema = list[PreMMLUDatasetItem]
+    cache_key = response_cache.cache_key(data, model_name, prompt, schema)
+    result = load_cached_json(cache_key)
+    if result is not None:
+        logger.info(f"成功解析題目卷，共獲取 {len(result)} 個題目")
+        return result
 
     logger.info(f"使用模型 {model_name} 解析PDF內容")
     try:
@@ -95,14 +203,12 @@ def resolve_question_from_pdf(file_path: str) -> list[PreMMLUDatasetItem]:
             model=model_name,  # 使用預設的模型
             contents=[
                 # 將PDF檔案轉換為bytes並指定MIME類型
-                types.Part.from_bytes(
-                    data=file.read_bytes(), mime_type="application/pdf"
-                ),
+                types.Part.from_bytes(data=data, mime_type="application/pdf"),
                 prompt,  # 加入Prompt指導模型如何處理內容
             ],
             config={
                 "response_mime_type": "application/json",  # 指定回應的MIME類型為JSON
-                "response_schema": list[PreMMLUDatasetItem],  # 指定回應應符合的資料結構
+                "response_schema": schema,  # 指定回應應符合的資料結構
                 # "max_output_tokens": 8096,  # 最大輸出token數（目前已註解）
             },
         )
@@ -112,8 +218,11 @@ def resolve_question_from_pdf(file_path: str) -> list[PreMMLUDatasetItem]:
             f"Token 使用量 - 輸入: {response.usage_metadata.prompt_token_count}, 輸出: {response.usage_metadata.candidates_token_count}, 總計: {response.usage_metadata.total_token_count}"
         )
 
-        # 將回應文字解析為JSON格式
+        # 將回應文字解析為JSON格式，成功後存入快取
         result = json.loads(response.text)
+        response_cache.put(
+            cache_key, model_name, response.text, response.usage_metadata
+        )
         logger.info(f"成功解析題目卷，共獲取 {len(result)} 個題目")
         return result
     except Exception as e:
@@ -147,14 +256,19 @@ def resolve_answer_from_pdf(file_path: str) -> list[PreAnswerItem]:
 
     # 定義Prompt，指示AI模型如何解析PDF內容並轉換為特定格式
     # 這裡特別指示模型只解析題號和答案，並符合PreAnswerItem格式
-    prompt = """
-    Please recognize the content of the file and extract the content of the file, then recompose the content into json format,
-    you shold follow the rules below:
-    1. only parse the question number and answer, and the format should match PreAnswerItem format.
-    2. the question number should be in the format of "題號: 題目"
-    3. the answer should be in the format of "答案: 答案"
-    4. Just put # sign in the answer field if you recognize the answer is # or cannot recognize the answer.
-    """
+    prompt = ANSWER_PROMPT
+
+    data = file.read_bytes()
+    result = parse_answer_sheet_locally(data)
+    if result is not None:
+        return result
+
+    schema = list[PreAnswerItem]
+    cache_key = response_cache.cache_key(data, modle_name_for_answer, prompt, schema)
+    result = load_cached_json(cache_key)
+    if result is not None:
+        logger.info(f"成功解析答案卷，共獲取 {len(result)} 個答案項目")
+        return result
 
     logger.info(f"使用模型 {modle_name_for_answer} 解析答案卷PDF內容")
     try:
@@ -164,14 +278,12 @@ def resolve_answer_from_pdf(file_path: str) -> list[PreAnswerItem]:
             model=modle_name_for_answer,  # 使用專門處理答案的模型
             contents=[
                 # 將PDF檔案轉換為bytes並指定MIME類型
-                types.Part.from_bytes(
-                    data=file.read_bytes(), mime_type="application/pdf"
-                ),
+                types.Part.from_bytes(data=data, mime_type="application/pdf"),
                 prompt,  # 加入Prompt指導模型如何處理內容
             ],
             config={
                 "response_mime_type": "application/json",  # 指定回應的MIME類型為JSON
-                "response_schema": list[PreAnswerItem],  # 指定回應應符合的資料結構
+                "response_schema": schema,  # 指定回應應符合的資料結構
             },
         )
 
@@ -180,8 +292,11 @@ def resolve_answer_from_pdf(file_path: str) -> list[PreAnswerItem]:
             f"Token 使用量 - 輸入: {response.usage_metadata.prompt_token_count}, 輸出: {response.usage_metadata.candidates_token_count}, 總計: {response.usage_metadata.total_token_count}"
         )
 
-        # 將回應文字解析為JSON格式
+        # 將回應文字解析為JSON格式，成功後存入快取
         result = json.loads(response.text)
+        response_cache.put(
+            cache_key, modle_name_for_answer, response.text, response.usage_metadata
+        )
         logger.info(f"成功解析答案卷，共獲取 {len(result)} 個答案項目")
         return result
     except Exception as e:
@@ -204,9 +319,13 @@ def merge_question_and_answer(
     返回:
         合併後的資料列表，每個元素包含題目資訊與對應的答案
 
+    異常:
+        ValueError: 答案無法辨識
+
     注意:
         - 此 function 假設 questions 與 answers 列表長度相同，且順序一一對應
-        - 使用 Python 的解構語法 {**question, "answer": answer['answer']} 將答案合併到題目 dictionary 中
+        - 答案字母以 engine.answer_fields 轉為選項索引（從 0 開始，# 為送分），
+          與 regex parser 寫入的題庫相同
     """
     logger.info(
         f"開始合併題目與答案，題目數量: {len(questions)}，答案數量: {len(answers)}"
@@ -219,7 +338,7 @@ def merge_question_and_answer(
         return []
     # 使用 list comprehension 與 dictionary unpacking 技術合併資料
     merged_data = [
-        {**question, "answer": answer["answer"]}
+        {**question, **engine.answer_fields(answer["answer"])}
         for question, answer in zip(questions, answers)
     ]
 
@@ -238,6 +357,10 @@ def download_file_if_not_exists(
     """
     檢查檔案是否存在，如果不存在或已毀損則從指定的 URL 下載
 
+    下載交由 downloader.download_file：先寫入暫存檔再以 os.replace 換成正式檔名，
+    不會寫穿指向 .blobs 的 hard link；回應不是 PDF 時視為失敗；
+    成功時納入同一資料夾的 .blobs 儲存區並記錄於上層目錄的下載清單。
+
     Args:
         file_path (str): 目標檔案的路徑
         file_url (str): 檔案的下載 URL
@@ -288,19 +411,24 @@ def download_file_if_not_exists(
 
         try:
             logger.info(f"嘗試從網址下載{file_type}: {file_url}")
-            # 建立下載目錄
-            download_dir = os.path.dirname(file_path)
-            if not os.path.exists(download_dir):
-                os.makedirs(download_dir)
-                logger.info(f"已建立下載目錄: {download_dir}")
-
-            # 下載檔案
-            response = requests.get(file_url, timeout=30)
-            response.raise_for_status()  # 確認請求成功
-
-            # 寫入檔案
-            with open(file_path, "wb") as f:
-                f.write(response.content)
+            bank_folder = os.path.dirname(os.path.abspath(file_path))
+            session = downloader.create_session(1)
+            manifest = DownloadManifest(
+                os.path.join(os.path.dirname(bank_folder), DEFAULT_MANIFEST_PATH)
+            )
+            try:
+                # 本機檔案不存在或已毀損，不需條件式確認
+                downloader.download_file(
+                    session,
+                    downloader.DownloadTask(file_url, file_path, file_type),
+                    timeout=30,
+                    manifest=manifest,
+                    refresh="force",
+                    blob_store=BlobStore(os.path.join(bank_folder, ".blobs")),
+                )
+            finally:
+                manifest.close()
+                session.close()
 
             logger.info(f"成功下載{file_type}至: {file_path}")
             return True
@@ -311,109 +439,418 @@ def download_file_if_not_exists(
     return True
 
 
-if __name__ == "__main__":
-    question_json_folder = os.path.join(
-        Path().absolute().parent, "exams_tw", "question_json"
+def resolve_pdf_path(file_path: str) -> pathlib.Path:
+    """
+    建立完整的檔案路徑（相對路徑以上層目錄為準，與 resolve_question_from_pdf 相同）
+    """
+    return pathlib.Path(os.path.join(os.path.dirname(os.path.abspath(".")), file_path))
+
+
+def exams_tw_folder(name: str) -> str:
+    """
+    取得 exams_tw 底下資料夾的完整路徑
+    """
+    return os.path.join(Path().absolute().parent, "exams_tw", name)
+
+
+async def agenerate_json(
+    data: bytes,
+    model: str,
+    prompt: str,
+    schema,
+    expected_output_tokens: int,
+    limiter: RateLimiter,
+    budget: TokenBudget,
+    cache_data: bytes = None,
+) -> list:
+    """
+    以非同步的 API 呼叫將 PDF 內容轉換為符合 schema 的 JSON
+
+    回應快取中已有相同請求的結果時直接回傳，不需等待額度也不花費 token；
+    否則送出前先依估計的 token 數向 budget 與 limiter 預約額度，
+    收到回應後以實際用量修正兩者，請求失敗時取消預算的預約。
+
+    Args:
+        cache_data (bytes): 計算快取 key 用的內容，預設為 data；切割後的 PDF 每次輸出的 /ID 都不同，
+            改以原始 PDF 內容搭配含頁數範圍的 prompt 作為 key
+
+    Raises:
+        TokenBudgetExceeded: token 預算已用完，請求不會送出
+    """
+    cache_key = response_cache.cache_key(
+        data if cache_data is None else cache_data, model, prompt, schema
     )
+    result = await asyncio.to_thread(load_cached_json, cache_key)
+    if result is not None:
+        return result
 
-    # 檢查資料夾是否存在
-    if not os.path.exists(question_json_folder):
-        logger.warning(f"資料夾不存在: {question_json_folder}")
-        os.makedirs(question_json_folder)
-        logger.info(f"已建立資料夾: {question_json_folder}")
+    estimate = estimate_pdf_tokens(data) + expected_output_tokens
+    reserved = budget.reserve(estimate)
+    try:
+        reservation = await limiter.acquire(estimate)
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=[
+                types.Part.from_bytes(data=data, mime_type="application/pdf"),
+                prompt,
+            ],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": schema,
+            },
+        )
+    except BaseException:
+        budget.release(reserved)
+        raise
 
-    # 取得資料夾中所有的 JSON 檔案
-    json_files = [f for f in os.listdir(question_json_folder) if f.endswith(".json")]
-    json_files.sort()
-    logger.info(f"在 {question_json_folder} 中找到 {len(json_files)} 個 JSON 檔案")
+    usage = response.usage_metadata
+    total_tokens = usage.total_token_count or 0
+    limiter.settle(reservation, total_tokens)
+    budget.settle(reserved, total_tokens)
+    logger.info(
+        f"Token 使用量 - 輸入: {usage.prompt_token_count}, 輸出: {usage.candidates_token_count}, 總計: {total_tokens}"
+    )
+    result = json.loads(response.text)
+    await asyncio.to_thread(response_cache.put, cache_key, model, response.text, usage)
+    return result
 
-    # 迴圈處理每個 JSON 檔案
-    for i, json_file in enumerate(json_files):
-        file_path = os.path.join(question_json_folder, json_file)
-        logger.info(f"正在處理檔案: {file_path}")
 
-        # 測試用，只處理特定檔案
-        if not json_file.endswith("fse00009968.json"):
-            continue
+async def aresolve_question_from_pdf(
+    file_path: str, limiter: RateLimiter, budget: TokenBudget
+) -> list[PreMMLUDatasetItem]:
+    """
+    解析題目卷，非同步版本的 resolve_question_from_pdf
 
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                json_data = json.load(f)
-
-            # 檢查題庫是否已有足夠題目，如果已有足夠題目數量，表兆該檔案已正確處理過，應跳過
-            if (
-                "題庫" in json_data
-                and isinstance(json_data["題庫"], list)
-                and len(json_data["題庫"]) >= 20
-            ):
-                logger.info(
-                    f"檔案 {json_file} 已有 {len(json_data['題庫'])} 題，跳過處理"
+    超過 CHUNK_PAGES 頁的題目卷切成重疊的多份（見 pdf_chunks）同時送出，
+    再以題號合併，整份考卷的延遲只取決於最慢的一份。
+    """
+    logger.info(f"開始解析題目卷: {file_path}，使用模型 {model_name}")
+    data = await asyncio.to_thread(resolve_pdf_path(file_path).read_bytes)
+    schema = list[PreMMLUDatasetItem]
+    if CHUNK_PAGES:
+        chunks = await asyncio.to_thread(
+            pdf_chunks.split_pdf, data, CHUNK_PAGES, CHUNK_OVERLAP
+        )
+    else:
+        chunks = [(1, None, data)]
+
+    if len(chunks) == 1:
+        result = await agenerate_json(
+            data,
+            model_name,
+            QUESTION_PROMPT,
+            schema,
+            QUESTION_OUTPUT_TOKENS,
+            limiter,
+            budget,
+        )
+    else:
+        total = chunks[-1][1]
+        logger.info(f"題目卷共 {total} 頁，切成 {len(chunks)} 份同時解析")
+        results = await asyncio.gather(
+            *(
+                agenerate_json(
+                    chunk,
+                    model_name,
+                    QUESTION_PROMPT
+                    + QUESTION_CHUNK_PROMPT.format(start=start, end=end, total=total),
+                    schema,
+                    # 輸出 token 依頁數比例估計
+                    QUESTION_OUTPUT_TOKENS * (end - start + 1) // total,
+                    limiter,
+                    budget,
+                    cache_data=data,
                 )
-                continue
-
-            # 從 JSON 資料中取得試題檔案名稱，若不存在則返回空字串
-            question_file_name = json_data.get("試題檔案", "")
-            # 構建試題檔案的完整路徑
-            question_file = os.path.join(
-                Path().absolute().parent,
-                "exams_tw",
-                "question_bank",
-                question_file_name,
-            )
+                for start, end, chunk in chunks
+            ),
+            return_exceptions=True,
+        )
+        for chunk_result in results:
+            if isinstance(chunk_result, BaseException):
+                raise chunk_result
+        result = pdf_chunks.stitch_questions(results)
+        logger.info(
+            f"合併 {len(chunks)} 份結果：{sum(len(r) for r in results)} 題去除重複後為 {len(result)} 題"
+        )
 
-            # 從 JSON 資料中取得試題網址
-            question_url = json_data.get("試題網址", "")
-
-            # 下載試題檔案
-            if not download_file_if_not_exists(question_file, question_url, "試題檔案"):
-                continue
-
-            logger.info(f"開始解析試題檔案: {question_file}")
-            # 呼叫 function 解析 PDF 格式的試題檔案
-            questions = resolve_question_from_pdf(question_file)
-            logger.info(f"試題解析完成，共取得 {len(questions)} 個題目")
-
-            # 從 JSON 資料中取得答案檔案名稱，若不存在則返回空字串
-            answer_file_name = json_data.get("測驗式試題答案檔案", "")
-            # 構建答案檔案的完整路徑
-            answer_file = os.path.join(
-                Path().absolute().parent,
-                "exams_tw",
-                "question_bank",
-                answer_file_name,
-            )
+    logger.info(f"成功解析題目卷，共獲取 {len(result)} 個題目")
+    return result
 
-            # 從 JSON 資料中取得答案網址
-            answer_url = json_data.get("測驗式試題答案網址", "")
 
-            # 下載答案檔案
-            if not download_file_if_not_exists(answer_file, answer_url, "答案檔案"):
-                continue
+async def aresolve_answer_from_pdf(
+    file_path: str, limiter: RateLimiter, budget: TokenBudget
+) -> list[PreAnswerItem]:
+    """
+    解析答案卷，非同步版本的 resolve_answer_from_pdf
+    """
+    logger.info(f"開始解析答案卷: {file_path}")
+    data = await asyncio.to_thread(resolve_pdf_path(file_path).read_bytes)
+    result = await asyncio.to_thread(parse_answer_sheet_locally, data)
+    if result is not None:
+        return result
 
-            logger.info(f"開始解析答案卷: {answer_file}")
-            # 呼叫 function 解析 PDF 格式的答案檔案
-            answers = resolve_answer_from_pdf(answer_file)
-            logger.info(f"答案解析完成，共取得 {len(answers)} 個答案")
+    logger.info(f"使用模型 {modle_name_for_answer} 解析答案卷")
+    result = await agenerate_json(
+        data,
+        modle_name_for_answer,
+        ANSWER_PROMPT,
+        list[PreAnswerItem],
+        ANSWER_OUTPUT_TOKENS,
+        limiter,
+        budget,
+    )
+    logger.info(f"成功解析答案卷，共獲取 {len(result)} 個答案項目")
+    return result
 
-            # 將解析出的題目與答案進行合併處理
-            logger.info(f"開始合併題目與答案: 檔案 {json_file}")
-            question_answers = merge_question_and_answer(questions, answers)
-            logger.info(
-                f"題目與答案合併完成，共產生 {len(question_answers)} 筆完整資料"
-            )
 
-            # 將處理好的題目與答案合併到 json_data 的題庫欄位中
-            json_data["題庫"] = question_answers
+def write_question_bank(
+    json_path: str, json_data: dict, question_bank: list, source: str
+):
+    """
+    將題庫與其來源（regex:版面名稱 或 gemini）寫回 JSON
+    """
+    json_data["題庫"] = question_bank
+    json_data["題庫來源"] = source
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(json_data, f, ensure_ascii=False, indent=2)
+    logger.info(
+        f"已將 {len(question_bank)} 筆題目與答案資料寫回檔案（{source}）: {json_path}"
+    )
+
+
+async def resolve_exam(
+    json_path: str, bank_folder: str, limiter: RateLimiter, budget: TokenBudget
+) -> str:
+    """
+    處理一份考卷 JSON：下載試題與答案檔案、同時解析兩者、合併後寫回 JSON
+
+    LOCAL_FIRST 時先以 regex parser 解析，通過檢查即直接寫回，不呼叫 Gemini；
+    使用的方式記錄在 JSON 的「題庫來源」欄位。
+
+    Returns:
+        str: local（regex parser 完成）、done、skipped 或 failed
+
+    Raises:
+        TokenBudgetExceeded: token 預算已用完，這份考卷不會寫回
+    """
+    json_file = os.path.basename(json_path)
+    logger.info(f"正在處理檔案: {json_path}")
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            json_data = json.load(f)
+
+        # 檢查題庫是否已有足夠題目，如果已有足夠題目數量，表示該檔案已正確處理過，應跳過
+        if (
+            "題庫" in json_data
+            and isinstance(json_data["題庫"], list)
+            and len(json_data["題庫"]) >= MIN_QUESTION_COUNT
+        ):
+            logger.info(f"檔案 {json_file} 已有 {len(json_data['題庫'])} 題，跳過處理")
+            return "skipped"
+
+        question_file = os.path.join(bank_folder, json_data.get("試題檔案", ""))
+        answer_file = os.path.join(bank_folder, json_data.get("測驗式試題答案檔案", ""))
+        downloads = await asyncio.gather(
+            asyncio.to_thread(
+                download_file_if_not_exists,
+                question_file,
+                json_data.get("試題網址", ""),
+                "試題檔案",
+            ),
+            asyncio.to_thread(
+                download_file_if_not_exists,
+                answer_file,
+                json_data.get("測驗式試題答案網址", ""),
+                "答案檔案",
+            ),
+        )
+        if not all(downloads):
+            return "failed"
+
+        if LOCAL_FIRST:
+            local = await asyncio.to_thread(
+                router.resolve_locally,
+                question_file,
+                answer_file,
+                exams_tw_folder("question_images"),
+            )
+            if local.ok:
+                write_question_bank(
+                    json_path, json_data, local.question_bank, local.source
+                )
+                return "local"
             logger.info(
-                f"已將 {len(question_answers)} 筆題目與答案資料合併至 JSON 檔案的題庫欄位"
+                f"{json_file} 未通過 regex parser 檢查（{local.layout}），改用 Gemini："
+                f"{'；'.join(local.problems)}"
             )
 
-            # 將更新後的資料寫回原始 JSON 檔案
-            # 使用 'w' 模式覆寫原檔案，ensure_ascii=False 確保中文字符正確顯示，indent=2 使 JSON 格式化便於閱讀
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"已將更新後的資料寫回檔案: {file_path}")
+        # 題目卷與答案卷同時解析，任一失敗時等另一個請求結束後再丟出例外
+        results = await asyncio.gather(
+            aresolve_question_from_pdf(question_file, limiter, budget),
+            aresolve_answer_from_pdf(answer_file, limiter, budget),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        questions, answers = results
+
+        question_answers = merge_question_and_answer(questions, answers)
+        if not question_answers:
+            # 題目數與答案數不一致（或沒有解析出題目）時不寫回，下次執行會重新處理
+            logger.error(f"{json_file} 的題目與答案無法合併，JSON 維持不變")
+            return "failed"
+        write_question_bank(
+            json_path, json_data, question_answers, router.SOURCE_GEMINI
+        )
+        return "done"
+    except TokenBudgetExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"處理檔案 {json_file} 時發生錯誤: {e.__class__.__name__}: {e}")
+        return "failed"
+
+
+@dataclass
+class ResolveStats:
+    """非同步批次處理統計"""
+
+    local: int = 0  # 由 regex parser 完成，未呼叫 Gemini
+    done: int = 0
+    skipped: int = 0
+    failed: int = 0
+    not_started: int = 0  # 預算用完而未處理的考卷
+    budget_exhausted: bool = False
+    failures: list = field(default_factory=list)
+
+    def summary(self, budget: TokenBudget) -> str:
+        return (
+            f"regex parser 完成 {self.local} 份，Gemini 完成 {self.done} 份，跳過 {self.skipped} 份，失敗 {self.failed} 份，"
+            f"因預算用完未處理 {self.not_started} 份；"
+            f"共 {budget.requests} 個請求，使用 {budget.spent} token"
+        )
 
-            logger.info(f"成功處理檔案: {json_file}")
-        except Exception as e:
-            logger.error(f"處理檔案 {json_file} 時發生錯誤: {str(e)}")
+
+async def resolve_exams(
+    json_paths: list[str],
+    bank_folder: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    limiter: RateLimiter = None,
+    budget: TokenBudget = None,
+) -> ResolveStats:
+    """
+    同時處理最多 concurrency 份考卷，所有請求共用同一組速率限制與 token 預算
+
+    預算用完後不再開始新的考卷，處理中的考卷若還需要送出請求則放棄不寫回，
+    已寫回的 JSON 不受影響，下次執行時會自動跳過。
+    """
+    limiter = limiter or RateLimiter()
+    budget = budget or TokenBudget()
+    stats = ResolveStats()
+    pending = list(reversed(json_paths))
+
+    async def worker():
+        while pending and not stats.budget_exhausted:
+            json_path = pending.pop()
+            try:
+                status = await resolve_exam(json_path, bank_folder, limiter, budget)
+            except TokenBudgetExceeded as e:
+                if not stats.budget_exhausted:
+                    logger.warning(f"停止處理：{e}")
+                stats.budget_exhausted = True
+                stats.not_started += 1
+                return
+            setattr(stats, status, getattr(stats, status) + 1)
+            if status == "failed":
+                stats.failures.append(os.path.basename(json_path))
+
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    stats.not_started += len(pending)
+    logger.info(stats.summary(budget))
+    return stats
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="以 Gemini 解析考卷 PDF")
+    arg_parser.add_argument(
+        "json_files", nargs="*", help="要處理的 JSON 檔名，未指定則處理資料夾中全部"
+    )
+    arg_parser.add_argument(
+        "--folder", default=exams_tw_folder("question_json"), help="JSON 資料夾"
+    )
+    arg_parser.add_argument(
+        "--concurrency",
+        "-j",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="同時處理的考卷數",
+    )
+    arg_parser.add_argument("--rpm", type=int, help="每分鐘最多請求數")
+    arg_parser.add_argument("--tpm", type=int, help="每分鐘最多 token 數")
+    arg_parser.add_argument(
+        "--token-budget", type=int, help="整次執行可使用的 token 總量，用完即停止"
+    )
+    arg_parser.add_argument(
+        "--chunk-pages",
+        type=int,
+        default=CHUNK_PAGES,
+        help="題目卷切成多份平行解析時每份的頁數，0 表示整份送出",
+    )
+    arg_parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=CHUNK_OVERLAP,
+        help="相鄰兩份重疊的頁數",
+    )
+    arg_parser.add_argument(
+        "--gemini-answers",
+        action="store_true",
+        help="答案卷也送 Gemini 解析，不使用 answer_sheet 的本機解析",
+    )
+    arg_parser.add_argument(
+        "--no-local",
+        action="store_true",
+        help="不先以 regex parser 解析，每份考卷都送 Gemini",
+    )
+    arg_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="不使用回應快取中的結果，一律重新呼叫 API（新的回應仍會寫入快取）",
+    )
+    arg_parser.add_argument(
+        "--base-url", help="API 端點，例如 fake_gemini.py 的 http://127.0.0.1:8765"
+    )
+    args = arg_parser.parse_args()
+
+    if args.base_url:
+        client = create_client(args.base_url)
+    REFRESH_CACHE = args.refresh
+    LOCAL_FIRST = not args.no_local
+    LOCAL_ANSWERS = not args.gemini_answers
+    CHUNK_PAGES = args.chunk_pages
+    CHUNK_OVERLAP = args.chunk_overlap
+
+    question_json_folder = args.folder
+
+    # 檢查資料夾是否存在
+    if not os.path.exists(question_json_folder):
+        logger.warning(f"資料夾不存在: {question_json_folder}")
+        os.makedirs(question_json_folder)
+        logger.info(f"已建立資料夾: {question_json_folder}")
+
+    # 取得資料夾中所有的 JSON 檔案
+    json_files = args.json_files or [
+        f for f in os.listdir(question_json_folder) if f.endswith(".json")
+    ]
+    json_files.sort()
+    logger.info(f"在 {question_json_folder} 中找到 {len(json_files)} 個 JSON 檔案")
+
+    asyncio.run(
+        resolve_exams(
+            [os.path.join(question_json_folder, f) for f in json_files],
+            exams_tw_folder("question_bank"),
+            args.concurrency,
+            RateLimiter(args.rpm, args.tpm),
+            TokenBudget(args.token_budget),
+        )
+    )
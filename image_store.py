@@ -0,0 +1,319 @@
+"""
+以內容 hash 定址的試題圖片儲存區
+
+原本的圖片檔名為 {pdf_name}_page{n}_img{k}.{ext}，同一個印章、標誌或重複使用的解剖圖
+在每份考卷（以及每份重複的 PDF）都會再寫一次。
+本模組將圖片依內容的 sha256 存放於 question_images/ab/<sha256>.<ext>，
+題庫中 images 欄位記錄的即是這個相對路徑，內容相同的圖片只寫入一次，
+既有程式仍可直接以 os.path.join(question_images, filename) 開啟。
+
+perceptual 模式另計算 dHash（64 bit），內容不同但看起來相同的圖片
+（例如同一張圖重新壓縮）會參照先存入的那一張；需解碼每張圖片，預設關閉。
+dHash 只有 64 bit，不同的圖片也可能相同，因此 dHash 相同時還須尺寸相同、
+且縮圖的像素差異在 MAX_PIXEL_DIFF 以內才視為同一張，否則另存新圖。
+dHash 索引存放於 .phash/，以建立檔案的方式登記，多個 process 同時寫入也只有一個會生效。
+
+migrate 先將舊檔存入儲存區並把 {舊檔名: 新路徑} 寫入 MIGRATION_MAP，再更新 JSON，
+最後才刪除舊檔；中途中斷時舊檔仍在，重新執行即可，之後再以 --json-dir 更新其他資料夾時也沿用這份對照表。
+
+使用方式：
+    python image_store.py migrate question_images --json-dir question_json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = "question_images"
+PHASH_DIR = ".phash"
+MIGRATION_MAP = ".migration_map.json"  # migrate 產生的 {舊檔名: 新路徑}，存放於 root
+
+# 是否以 dHash 合併看起來相同的圖片，batch_runner --phash 會將其開啟
+PERCEPTUAL_DEDUPE = False
+
+# 單色圖片的 dHash 皆為 0，不列入 perceptual 比對
+_BLANK_HASH = 0
+
+# dHash 相同的兩張圖片比較縮圖時的大小與允許的平均像素差異（灰階 0 ~ 255）
+COMPARE_SIZE = (32, 32)
+MAX_PIXEL_DIFF = 4
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    計算圖片的 dHash（縮為 9x8 灰階後比較左右相鄰像素的亮度）
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def looks_identical(image: Image.Image, other: Image.Image) -> bool:
+    """
+    檢查兩張 dHash 相同的圖片是否真的是同一張：尺寸相同，且灰階縮圖的平均像素差異在 MAX_PIXEL_DIFF 以內
+    """
+    if image.size != other.size:
+        return False
+    pixels = image.convert("L").resize(COMPARE_SIZE, Image.LANCZOS).getdata()
+    other_pixels = other.convert("L").resize(COMPARE_SIZE, Image.LANCZOS).getdata()
+    diff = sum(abs(a - b) for a, b in zip(pixels, other_pixels))
+    return diff / len(pixels) <= MAX_PIXEL_DIFF
+
+
+class ImageStore:
+    """
+    以 sha256 為 key 的圖片儲存區
+    """
+
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, perceptual: bool = None):
+        """
+        Args:
+            root (str): 圖片存放目錄
+            perceptual (bool): 是否以 dHash 合併看起來相同的圖片，未指定則依 PERCEPTUAL_DEDUPE
+        """
+        self.root = root
+        self.perceptual = PERCEPTUAL_DEDUPE if perceptual is None else perceptual
+
+    def relative_path(self, sha256: str, extension: str) -> str:
+        """
+        回傳圖片相對於 root 的路徑，以 hash 前兩碼分層避免單一資料夾檔案過多
+        """
+        return f"{sha256[:2]}/{sha256}.{extension}"
+
+    def path(self, filename: str) -> str:
+        """
+        回傳題庫中記錄的圖片在磁碟上的路徑
+        """
+        return os.path.join(self.root, filename)
+
+    def put(self, data: bytes, extension: str) -> str:
+        """
+        存入已編碼的圖片，內容相同的圖片已存在時不再寫入
+
+        Args:
+            data (bytes): 圖片檔案內容
+            extension (str): 副檔名（jpeg、png 等）
+
+        Returns:
+            str: 題庫中記錄的圖片路徑（相對於 root）
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        filename = self.relative_path(sha256, extension)
+        path = self.path(filename)
+        if os.path.exists(path):
+            return filename
+
+        if self.perceptual:
+            similar = self._find_similar(data, filename)
+            if similar:
+                return similar
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 暫存檔名每次都不同，多個 thread 同時存入同一張圖片時各自寫完再取代，內容相同
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f"{sha256}.", suffix=".tmp"
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return filename
+
+    def put_image(self, image: Image.Image, file_format: str, **save_args) -> str:
+        """
+        將 PIL 圖片編碼後存入
+
+        Args:
+            file_format (str): PIL 的格式名稱（JPEG、PNG 等）
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, file_format, **save_args)
+        return self.put(buffer.getvalue(), file_format.lower())
+
+    def _find_similar(self, data: bytes, filename: str) -> str:
+        """
+        以 dHash 找出看起來相同的已存圖片，沒有則將 filename 登記為此 dHash 的代表圖片
+
+        dHash 相同但尺寸或內容不同（looks_identical）時不參照已存圖片。
+
+        Returns:
+            str: 已存圖片的路徑，沒有則回傳 None
+        """
+        try:
+            image = Image.open(io.BytesIO(data))
+        except Exception:
+            return None
+        with image:
+            try:
+                value = dhash(image)
+            except Exception:
+                return None
+            if value == _BLANK_HASH:
+                return None
+            similar = self._lookup_phash(value, filename)
+            if similar is None:
+                return None
+            try:
+                with Image.open(self.path(similar)) as stored:
+                    if looks_identical(image, stored):
+                        return similar
+            except Exception:
+                return None
+        logger.debug(f"{filename} 與 {similar} 的 dHash 相同但內容不同，另存新圖")
+        return None
+
+    def _lookup_phash(self, value: int, filename: str) -> str:
+        """
+        取得此 dHash 登記的代表圖片，沒有則將 filename 登記為代表圖片並回傳 None
+        """
+        index_dir = os.path.join(self.root, PHASH_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        index_path = os.path.join(index_dir, f"{value:016x}")
+        try:
+            with open(index_path, "x", encoding="utf-8") as f:
+                f.write(filename)
+            return None
+        except FileExistsError:
+            pass
+        with open(index_path, "r", encoding="utf-8") as f:
+            similar = f.read().strip()
+        return similar if similar and os.path.exists(self.path(similar)) else None
+
+    def load_migration_map(self) -> dict:
+        """
+        讀取先前 migrate 記錄的 {舊檔名: 新路徑}，沒有則回傳空 dict
+        """
+        try:
+            with open(self.path(MIGRATION_MAP), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_migration_map(self, mapping: dict):
+        """
+        將 mapping 併入 MIGRATION_MAP
+        """
+        merged = {**self.load_migration_map(), **mapping}
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(MIGRATION_MAP)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f"{MIGRATION_MAP}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=0)
+        os.replace(tmp_path, path)
+
+    def migrate_folder(self, folder: str) -> dict:
+        """
+        將舊格式（{pdf_name}_page{n}_img{k}.{ext}）的圖片存入儲存區並記錄對照表
+
+        舊檔不會刪除，更新 JSON 中的圖片路徑後再以 remove_migrated 刪除。
+
+        Returns:
+            dict: {舊檔名: 新的相對路徑}
+        """
+        mapping = {}
+        stored = set()
+        saved = 0
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            extension = os.path.splitext(entry.name)[1].lstrip(".").lower()
+            if not extension:
+                continue
+            with open(entry.path, "rb") as f:
+                data = f.read()
+            filename = self.put(data, extension)
+            if filename in stored:
+                saved += len(data)
+            stored.add(filename)
+            mapping[entry.name] = filename
+        self.save_migration_map(mapping)
+        logger.info(
+            f"{folder}: 存入 {len(mapping)} 張圖片，"
+            f"實際存放 {len(stored)} 張，省下 {saved / (1024 * 1024):.1f} MB"
+        )
+        return mapping
+
+    def remove_migrated(self, folder: str, mapping: dict) -> int:
+        """
+        刪除已存入儲存區的舊檔，儲存區中沒有對應檔案的舊檔保留
+
+        Returns:
+            int: 刪除的檔案數
+        """
+        removed = 0
+        for old_name, filename in mapping.items():
+            old_path = os.path.join(folder, old_name)
+            if os.path.isfile(old_path) and os.path.exists(self.path(filename)):
+                os.remove(old_path)
+                removed += 1
+        logger.info(f"{folder}: 刪除 {removed} 個已搬移的舊檔")
+        return removed
+
+
+def rewrite_references(json_dir: str, mapping: dict) -> int:
+    """
+    將 JSON 題庫中 images 的舊檔名改為儲存區的路徑
+
+    Returns:
+        int: 更新的 JSON 檔數
+    """
+    updated = 0
+    for name in sorted(os.listdir(json_dir)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(json_dir, name)
+        with open(path, "r", encoding="utf-8") as f:
+            exam_data = json.load(f)
+        changed = False
+        for question in exam_data.get("題庫") or []:
+            images = question.get("images") or []
+            new_images = [mapping.get(image, image) for image in images]
+            if new_images != images:
+                question["images"] = new_images
+                changed = True
+        if changed:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(exam_data, f, ensure_ascii=False, indent=2)
+            updated += 1
+    logger.info(f"{json_dir}: 更新 {updated} 個 JSON")
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="以內容 hash 定址的試題圖片儲存區")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="將舊格式檔名的圖片搬進儲存區，並更新 JSON 中的圖片路徑"
+    )
+    migrate_parser.add_argument("folder", nargs="?", default=DEFAULT_IMAGE_DIR)
+    migrate_parser.add_argument(
+        "--json-dir", action="append", default=[], help="要更新圖片路徑的 JSON 資料夾"
+    )
+    migrate_parser.add_argument(
+        "--phash", action="store_true", help="以 dHash 合併看起來相同的圖片"
+    )
+    args = parser.parse_args()
+
+    store = ImageStore(args.folder, args.phash)
+    mapping = store.migrate_folder(args.folder)
+    # 先更新 JSON 再刪除舊檔，中斷時 JSON 參照的檔案仍然存在
+    for json_dir in args.json_dir:
+        rewrite_references(json_dir, store.load_migration_map())
+    store.remove_migrated(args.folder, mapping)
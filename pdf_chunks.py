@@ -0,0 +1,103 @@
+"""
+將 PDF 依頁數範圍切成多份，供 Gemini 平行解析
+
+80 題的醫學考卷整份送出時，單一請求要生成上萬個輸出 token，延遲很長，也容易碰到輸出上限。
+本模組將 PDF 切成每份 CHUNK_PAGES 頁、相鄰兩份重疊 CHUNK_OVERLAP 頁的小 PDF，
+各自解析後再以題號（no）合併：跨頁的題目在前一份會被截斷、在下一份的重疊頁中則是完整的，
+同一題號出現多次時保留選項較多、題目文字較長的版本。
+
+切割以 pypdfium2（pdfplumber 的相依套件）完成，pdfium 不是 thread-safe，所有操作以同一把鎖保護。
+"""
+
+import io
+import threading
+
+import pypdfium2 as pdfium
+
+CHUNK_PAGES = 4  # 每份的頁數
+CHUNK_OVERLAP = 1  # 相鄰兩份重疊的頁數
+
+_PDFIUM_LOCK = threading.Lock()
+
+
+def page_ranges(
+    page_count: int, chunk_pages: int = CHUNK_PAGES, overlap: int = CHUNK_OVERLAP
+) -> list[tuple[int, int]]:
+    """
+    計算各份的頁數範圍
+
+    Returns:
+        list[tuple[int, int]]: (起始頁, 結束頁)，0-based 且不含結束頁；
+            頁數不超過 chunk_pages 時只有一份
+    """
+    if chunk_pages <= overlap:
+        raise ValueError(f"每份頁數 ({chunk_pages}) 必須大於重疊頁數 ({overlap})")
+    ranges = []
+    start = 0
+    while True:
+        end = min(start + chunk_pages, page_count)
+        ranges.append((start, end))
+        if end >= page_count:
+            return ranges
+        start = end - overlap
+
+
+def split_pdf(
+    data: bytes, chunk_pages: int = CHUNK_PAGES, overlap: int = CHUNK_OVERLAP
+) -> list[tuple[int, int, bytes]]:
+    """
+    將 PDF 切成重疊的多份
+
+    Returns:
+        list[tuple[int, int, bytes]]: (起始頁, 結束頁, PDF 內容)，頁碼為 1-based 且包含結束頁；
+            頁數不超過 chunk_pages 時回傳原本的內容
+    """
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            page_count = len(pdf)
+            ranges = page_ranges(page_count, chunk_pages, overlap)
+            if len(ranges) == 1:
+                return [(1, page_count, data)]
+
+            chunks = []
+            for start, end in ranges:
+                chunk = pdfium.PdfDocument.new()
+                try:
+                    chunk.import_pages(pdf, list(range(start, end)))
+                    buffer = io.BytesIO()
+                    chunk.save(buffer)
+                finally:
+                    chunk.close()
+                chunks.append((start + 1, end, buffer.getvalue()))
+            return chunks
+        finally:
+            pdf.close()
+
+
+def _completeness(item: dict) -> tuple[int, int]:
+    return len(item.get("choices") or []), len(item.get("question") or "")
+
+
+def stitch_questions(chunk_results: list[list[dict]]) -> list[dict]:
+    """
+    以題號合併各份的解析結果
+
+    同一題號出現在多份中（跨越切割處的題目）時，保留選項較多、題目文字較長的版本。
+
+    Args:
+        chunk_results (list[list[dict]]): 依頁數順序排列的各份結果，每題需有 no 欄位
+
+    Returns:
+        list[dict]: 依題號排序的題目
+    """
+    best = {}
+    for items in chunk_results:
+        for item in items:
+            number = item.get("no")
+            if number is None:
+                continue
+            current = best.get(number)
+            if current is None or _completeness(item) > _completeness(current):
+                best[number] = item
+    return [best[number] for number in sorted(best)]
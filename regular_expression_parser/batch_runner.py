@@ -0,0 +1,416 @@
+"""
+regex parser 批次執行器
+
+各 process_exam_type0X.py 的 process_exam_questions 會為每一個 JSON 各自開啟並完整解析
+試題與答案 PDF。然而同一份試題網址或答案網址常被許多 fse 記錄共用（例如關務各類科共用
+的國文試題），本執行器先依來源 PDF 將 JSON 分組，每份不同的 PDF 只解析一次，
+再將結果寫入所有參照它的 JSON。
+
+來源 PDF 以內容 hash（blob_store.BlobStore.content_hash）辨識，檔名不同但內容相同的
+PDF 也只會解析一次；檔案不存在時退回以網址辨識。
+
+每份試題 PDF 為一個 task，以 --jobs 指定的 process 數平行執行，並可設定單一 task 的逾時。
+
+使用方式（於專案根目錄執行）：
+    python -m regular_expression_parser.batch_runner type02 --jobs 32
+    python -m regular_expression_parser.batch_runner type04 fse00014644.json
+    python -m regular_expression_parser.batch_runner type02 --routes layout_routes.json
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+
+import image_store
+from blob_store import BlobStore
+from regular_expression_parser import engine, pdf_pages
+
+PARSER_MODULES = {
+    "type01": "regular_expression_parser.process_exam_type01",
+    "type02": "regular_expression_parser.process_exam_type02",
+    "type03": "regular_expression_parser.process_exam_type03",
+    "type04": "regular_expression_parser.process_exam_type04",
+    "type05": "regular_expression_parser.process_exam_type05",
+}
+
+DEFAULT_JOBS = 1
+DEFAULT_TASK_TIMEOUT = 600  # 單一試題 PDF（含其答案）的解析逾時秒數
+
+
+def load_parser(parser_name: str):
+    """
+    依名稱載入 process_exam_type0X 模組
+    """
+    return importlib.import_module(PARSER_MODULES[parser_name])
+
+
+def source_key(store: BlobStore, file_path: str, url: str) -> str:
+    """
+    取得來源 PDF 的辨識 key：檔案存在時為內容 hash，否則為網址
+    """
+    if os.path.exists(file_path):
+        return store.content_hash(file_path)
+    return url or file_path
+
+
+def group_by_question_pdf(
+    json_filenames: list[str],
+    json_dir: str,
+    bank_dir: str,
+    store: BlobStore,
+    skipped: dict = None,
+) -> dict[str, list[dict]]:
+    """
+    讀取 JSON 並依試題 PDF 分組
+
+    Args:
+        skipped (dict): 傳入時記錄無法分組的 JSON：{json_filename: 原因}
+
+    Returns:
+        dict[str, list[dict]]: {試題 key: [記錄]}，每筆記錄包含
+            json_filename、question_path、answer_path 與 answer_key
+    """
+    if skipped is None:
+        skipped = {}
+    groups = {}
+    for json_filename in json_filenames:
+        json_path = os.path.join(json_dir, json_filename)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                exam_data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"[{json_filename}] 錯誤：無法讀取 JSON：{e}")
+            skipped[json_filename] = f"無法讀取 JSON：{e}"
+            continue
+
+        question_pdf = exam_data.get("試題檔案")
+        answer_pdf = exam_data.get("測驗式試題答案檔案")
+        if not question_pdf or not answer_pdf:
+            print(f"[{json_filename}] 找不到試題檔案或答案檔案欄位，跳過")
+            skipped[json_filename] = "找不到試題檔案或答案檔案欄位"
+            continue
+
+        question_path = os.path.join(bank_dir, question_pdf)
+        answer_path = os.path.join(bank_dir, answer_pdf)
+        question_key = source_key(store, question_path, exam_data.get("試題網址"))
+        answer_key = source_key(store, answer_path, exam_data.get("測驗式試題答案網址"))
+
+        groups.setdefault(question_key, []).append(
+            {
+                "json_filename": json_filename,
+                "question_path": question_path,
+                "answer_path": answer_path,
+                "answer_key": answer_key,
+            }
+        )
+    return groups
+
+
+def write_question_bank(json_path: str, question_bank: list[dict]):
+    """
+    將題庫寫回 JSON 檔案
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        exam_data = json.load(f)
+    exam_data["題庫"] = question_bank
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(exam_data, f, ensure_ascii=False, indent=2)
+
+
+class EmptyResultError(Exception):
+    """
+    試題 PDF 沒有解析出題目
+
+    extract_questions_from_pdf 會攔下解析時的例外並回傳空 list，因此解析失敗也以此回報。
+    """
+
+
+def parse_group(
+    parser, records: list[dict]
+) -> tuple[dict[str, list[dict]], dict[str, str]]:
+    """
+    解析一組共用同一份試題 PDF 的記錄
+
+    試題只解析一次；組內的答案 PDF 也依內容 hash 各只解析一次。
+    答案 PDF 沒有解析出答案的記錄列入失敗，不產生題庫。
+
+    Returns:
+        tuple[dict[str, list[dict]], dict[str, str]]: ({json_filename: 題庫}, {json_filename: 失敗原因})
+
+    Raises:
+        EmptyResultError: 試題 PDF 沒有解析出題目（包括解析時發生錯誤）
+    """
+    questions = parser.extract_questions_from_pdf(records[0]["question_path"])
+    if not questions:
+        raise EmptyResultError("試題 PDF 沒有解析出題目（錯誤訊息見上方輸出）")
+
+    answers_by_key = {}
+    results = {}
+    failures = {}
+    for record in records:
+        answer_key = record["answer_key"]
+        if answer_key not in answers_by_key:
+            answers_by_key[answer_key] = parser.extract_answers_from_pdf(
+                record["answer_path"]
+            )
+        answers = answers_by_key[answer_key]
+        if not answers:
+            failures[record["json_filename"]] = "答案 PDF 沒有解析出答案"
+            continue
+        results[record["json_filename"]] = engine.build_question_bank(
+            questions, answers
+        )
+    return results, failures
+
+
+def process_group(
+    parser_name: str, records: list[dict], json_dir: str, backend: str = None
+) -> dict:
+    """
+    解析一組記錄並寫回 JSON，於 worker process 中執行
+
+    Args:
+        backend (str): 覆蓋 parser 的 EXTRACTION_BACKEND，未指定則使用 parser 的設定
+
+    Returns:
+        tuple[dict[str, int], dict[str, str]]: ({json_filename: 題目數}, {json_filename: 失敗原因})，
+            失敗的 JSON 不會寫回
+    """
+    parser = importlib.import_module(parser_name)
+    if backend:
+        parser.EXTRACTION_BACKEND = backend
+    results, failures = parse_group(parser, records)
+    counts = {}
+    for json_filename, question_bank in results.items():
+        write_question_bank(os.path.join(json_dir, json_filename), question_bank)
+        counts[json_filename] = len(question_bank)
+        print(f"[{json_filename}] 成功寫入 {len(question_bank)} 個題目")
+    return counts, failures
+
+
+def _worker(
+    conn,
+    parser_name: str,
+    records: list[dict],
+    json_dir: str,
+    use_cache: bool,
+    backend: str,
+    perceptual: bool = False,
+):
+    """
+    worker process 進入點，結果或錯誤訊息經由 pipe 回傳
+    """
+    pdf_pages.USE_EXTRACTION_CACHE = use_cache
+    image_store.PERCEPTUAL_DEDUPE = perceptual
+    try:
+        conn.send(("ok", process_group(parser_name, records, json_dir, backend)))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+@dataclass
+class BatchStats:
+    """批次處理統計"""
+
+    json_files: int = 0
+    failed: int = 0
+    questions: int = 0
+    elapsed: float = 0.0
+    failures: dict = field(default_factory=dict)  # json_filename -> 失敗原因
+
+    def summary(self) -> str:
+        return (
+            f"完成 {self.json_files} 個 JSON，"
+            f"失敗 {self.failed} 個，共 {self.questions} 題，"
+            f"耗時 {self.elapsed:.1f} 秒"
+        )
+
+
+def run_batch(
+    parser,
+    json_filenames: list[str] = None,
+    jobs: int = DEFAULT_JOBS,
+    timeout: float = DEFAULT_TASK_TIMEOUT,
+    use_cache: bool = True,
+    backend: str = None,
+    perceptual: bool = False,
+) -> BatchStats:
+    """
+    以指定的 parser 批次處理 question_json 中的 JSON
+
+    每份試題 PDF（連同引用它的所有 JSON）為一個 task，各自在獨立的 process 中執行，
+    單一 PDF 造成的例外、崩潰或逾時只會讓該 task 失敗，不影響其他 task；
+    沒有解析出題目或答案的 JSON 也列為失敗且不寫回。無法讀取或缺少 PDF 欄位的 JSON
+    同樣列入 failures。
+
+    Args:
+        parser: type01 ~ type05，或已載入的 process_exam_type0X 模組
+        json_filenames (list[str]): 要處理的 JSON 檔名，未指定則處理資料夾中全部
+        jobs (int): 同時執行的 process 數
+        timeout (float): 單一 task 的逾時秒數，None 表示不限制
+        use_cache (bool): 是否使用 PDF 文字擷取快取（extraction_cache）
+        backend (str): pdfplumber 或 poppler，未指定則使用 parser 的 EXTRACTION_BACKEND
+        perceptual (bool): 是否以 dHash 合併看起來相同的圖片（見 image_store）
+
+    Returns:
+        BatchStats: 處理結果統計
+    """
+    if isinstance(parser, str):
+        parser = load_parser(parser)
+    # 以 python -m 執行時模組名稱為 __main__，需由 __spec__ 取得可供 worker 匯入的名稱
+    parser_name = parser.__spec__.name if parser.__spec__ else parser.__name__
+    json_dir = parser.QUESTION_JSON_DIR
+    if json_filenames is None:
+        json_filenames = sorted(f for f in os.listdir(json_dir) if f.endswith(".json"))
+
+    stats = BatchStats()
+    start = time.perf_counter()
+    store = BlobStore(os.path.join(parser.QUESTION_BANK_DIR, ".blobs"))
+    groups = group_by_question_pdf(
+        json_filenames, json_dir, parser.QUESTION_BANK_DIR, store, stats.failures
+    )
+    records = sum(len(g) for g in groups.values())
+    stats.failed = len(stats.failures)
+    print(
+        f"共 {records} 個 JSON，參照 {len(groups)} 份不同的試題 PDF，"
+        f"省下 {records - len(groups)} 次試題解析，以 {jobs} 個 process 執行"
+    )
+
+    def fail(records_in_group, reason):
+        print(f"[{records_in_group[0]['question_path']}] 失敗：{reason}")
+        for record in records_in_group:
+            stats.failures[record["json_filename"]] = reason
+        stats.failed += len(records_in_group)
+
+    pending = deque(groups.values())
+    running = {}  # conn -> (process, records, 開始時間)
+    while pending or running:
+        while pending and len(running) < max(jobs, 1):
+            records_in_group = pending.popleft()
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(
+                    child_conn,
+                    parser_name,
+                    records_in_group,
+                    json_dir,
+                    use_cache,
+                    backend,
+                    perceptual,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (process, records_in_group, time.monotonic())
+
+        wait_timeout = None
+        if timeout is not None:
+            now = time.monotonic()
+            wait_timeout = max(
+                0.0, min(started + timeout - now for _, _, started in running.values())
+            )
+        sentinels = {
+            process.sentinel: conn for conn, (process, _, _) in running.items()
+        }
+        ready = wait(list(running) + list(sentinels), wait_timeout)
+
+        finished = {sentinels.get(obj, obj) for obj in ready}
+        for conn in finished:
+            process, records_in_group, _ = running.pop(conn)
+            try:
+                status, result = conn.recv()
+            except EOFError:
+                # 沒有回傳結果就結束，表示 worker 崩潰（例如 segfault 或被 OOM kill）
+                process.join()
+                status, result = (
+                    "error",
+                    f"worker 異常結束 (exit code {process.exitcode})",
+                )
+            conn.close()
+            process.join()
+            if status == "ok":
+                counts, failures = result
+                stats.json_files += len(counts)
+                stats.questions += sum(counts.values())
+                for json_filename, reason in failures.items():
+                    stats.failures[json_filename] = reason
+                    stats.failed += 1
+            else:
+                fail(records_in_group, result)
+
+        if timeout is not None:
+            now = time.monotonic()
+            for conn, (process, records_in_group, started) in list(running.items()):
+                if now - started >= timeout:
+                    process.kill()
+                    process.join()
+                    conn.close()
+                    del running[conn]
+                    fail(records_in_group, f"逾時（超過 {timeout} 秒）")
+
+    stats.elapsed = time.perf_counter() - start
+    print(stats.summary())
+    for json_filename, reason in sorted(stats.failures.items()):
+        print(f"[{json_filename}] 失敗：{reason}")
+    return stats
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="regex parser 批次執行器")
+    arg_parser.add_argument("parser", choices=sorted(PARSER_MODULES))
+    arg_parser.add_argument("json_files", nargs="*", help="要處理的 JSON 檔名")
+    arg_parser.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count(), help="同時執行的 process 數"
+    )
+    arg_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TASK_TIMEOUT,
+        help="單一試題 PDF 的逾時秒數，0 表示不限制",
+    )
+    arg_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="不使用 PDF 文字擷取快取，一律重新解析 PDF",
+    )
+    arg_parser.add_argument(
+        "--backend",
+        choices=pdf_pages.BACKENDS,
+        help="PDF 擷取後端，未指定則使用 parser 的 EXTRACTION_BACKEND",
+    )
+    arg_parser.add_argument(
+        "--phash",
+        action="store_true",
+        help="以 dHash 合併看起來相同的圖片（例如重新壓縮的同一張圖）",
+    )
+    arg_parser.add_argument(
+        "--routes",
+        help="layout_detector route 產生的 routes 檔，處理其中屬於此 parser 的 JSON",
+    )
+    args = arg_parser.parse_args()
+
+    json_files = args.json_files
+    if args.routes:
+        from regular_expression_parser.layout_detector import load_routes
+
+        json_files = json_files + load_routes(args.routes, args.parser)
+
+    run_batch(
+        args.parser,
+        json_files or None,
+        args.jobs,
+        args.timeout or None,
+        not args.no_cache,
+        args.backend,
+        args.phash,
+    )
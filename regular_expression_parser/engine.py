@@ -0,0 +1,674 @@
+"""
+以版面設定（profiles.LayoutProfile）驅動的試題解析流程
+
+各 process_exam_type0X.py 只宣告使用的版面設定，擷取文字與題號位置、整理全文、
+找出題目與選項、分配圖片、解析答案與寫回 JSON 都在本模組完成。
+iter_questions 逐頁解析並逐題產生題目，extract_questions_from_pdf 收集其結果後依題號排序。
+
+每個版面設定的 regex 只在第一次使用時編譯一次（PROFILES 中的設定在 import 時即編譯），
+之後解析每份 PDF 都重複使用同一組 compiled pattern。
+"""
+
+import io
+import json
+import os
+import re
+import unicodedata
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Iterator
+
+from PIL import Image, ImageFile
+
+import util
+from answer_sheet import parse_notes
+from image_store import ImageStore
+from regular_expression_parser import glyphs, pdf_pages, running_headers, segmenter
+from regular_expression_parser.profiles import PROFILES, LayoutProfile
+from regular_expression_parser.question_anchors import QuestionAnchors
+
+# 設定檔案路徑
+QUESTION_JSON_DIR = "question_json"
+QUESTION_BANK_DIR = "question_bank"
+QUESTION_IMAGES_DIR = "question_images"
+
+# 答案字母依序對應選項索引 0 ~ 4（與 exam_schema.json 相同，從 0 開始）
+ANSWER_LETTERS = "ABCDE"
+# 送分（答案卷中標為 ＃）：任何選項都給分
+GIVEN_ANSWER_INDEX = -1
+
+# 答案卷中的「答案」列
+_ANSWER_ROW = re.compile(r"^\s*答\s*案(.*)$", re.MULTILINE)
+
+
+class CompiledProfile:
+    """
+    編譯過 regex 的版面設定
+    """
+
+    def __init__(self, profile: LayoutProfile):
+        self.profile = profile
+        self.number_re = re.compile(profile.number_pattern)
+        self.question_start_re = re.compile(profile.question_start)
+        self.choice_start_re = re.compile(profile.choice_start)
+        self.choice_re = re.compile(profile.choice_pattern)
+        self.answer_re = re.compile(profile.answer_pattern)
+        self.cleanups = [
+            (re.compile(sub.pattern, sub.flags), sub.repl) for sub in profile.cleanups
+        ]
+
+    def normalize(self, text: str) -> str:
+        """
+        以版面設定字型的對照表轉換私有區字元（一次 str.translate）
+        """
+        return glyphs.normalize(text, self.profile.glyph_family)
+
+    def decode_number(self, raw: str) -> str:
+        """
+        將題號字元轉換為數字字串，不在對照表中則保留原字元
+        """
+        return self.profile.number_map.get(raw, raw)
+
+    def clean(self, content: str) -> str:
+        """
+        依序執行版面設定中的 re.sub
+        """
+        for pattern, repl in self.cleanups:
+            content = pattern.sub(repl, content)
+        return content
+
+
+# 只有數字與空白的行，cleanups 可能將它與下一行合併
+_NUMERIC_LINE = re.compile(r"[\d\s]*")
+
+_COMPILED = {name: CompiledProfile(profile) for name, profile in PROFILES.items()}
+
+
+def compile_profile(profile: LayoutProfile) -> CompiledProfile:
+    """
+    取得版面設定編譯後的結果，同一個設定只編譯一次
+    """
+    compiled = _COMPILED.get(profile.name)
+    if compiled is None or compiled.profile is not profile:
+        compiled = CompiledProfile(profile)
+        _COMPILED[profile.name] = compiled
+    return compiled
+
+
+def save_image(image_obj, pdf_name, page_num, img_num, folder_name=QUESTION_IMAGES_DIR):
+    """
+    儲存圖片到指定目錄(僅處理JPEG/PNG/TIFF/GIF格式)
+
+    圖片依內容 hash 存放（見 image_store），回傳的 filename 為儲存區中的相對路徑
+    """
+    try:
+        store = ImageStore(folder_name)
+
+        # 已是 JPEG / JPEG 2000 編碼的圖片直接寫入，不經過 PIL 解碼再編碼
+        encoded = util.encoded_image(image_obj)
+        if encoded:
+            extension, data = encoded
+            image_filename = store.put(data, extension)
+            print(f"[{pdf_name}] 成功儲存 {extension.upper()} 圖片：{image_filename}")
+            return {
+                "filename": image_filename,
+                "bbox": image_obj.get("bbox", [0, 0, 0, 0]),
+                "page": page_num,
+            }
+
+        image_stream = image_obj["stream"].get_data()
+
+        # 基本格式檢測
+        file_format = None
+        if image_stream.startswith(b"\xff\xd8"):
+            file_format = "JPEG"
+        elif image_stream.startswith(b"\x89PNG"):
+            file_format = "PNG"
+        elif image_stream.startswith(b"II*\x00") or image_stream.startswith(b"MM\x00*"):
+            file_format = "TIFF"
+        elif image_stream.startswith(b"GIF8"):
+            file_format = "GIF"
+
+        # 非指定格式直接跳過
+        if not file_format:
+            print(f"[{pdf_name}] 跳過非支援格式圖片：頁面 {page_num}, 圖片 {img_num}")
+            return None
+
+        # 統一處理流程
+        try:
+            ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+            with Image.open(io.BytesIO(image_stream)) as image:
+                # 模式轉換
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+
+                # 儲存參數
+                save_args = {}
+                if file_format == "JPEG":
+                    save_args["quality"] = 90
+
+                image_filename = store.put_image(image, file_format, **save_args)
+                print(f"[{pdf_name}] 成功儲存 {file_format} 圖片：{image_filename}")
+
+                return {
+                    "filename": image_filename,
+                    "bbox": image_obj.get("bbox", [0, 0, 0, 0]),
+                    "page": page_num,
+                }
+
+        except Exception as img_error:
+            print(f"[{pdf_name}] 圖片處理失敗：{str(img_error)}")
+            return None
+
+    except Exception as e:
+        print(f"[{pdf_name}] 儲存圖片時發生錯誤：{str(e)}")
+        return None
+
+
+def single_image_handler(pdf_name: str, folder_name: str) -> pdf_pages.ImageHandler:
+    """
+    逐張以 save_image 儲存圖片的 image_handler，回傳的圖片資訊包含 top 與 bottom
+    """
+
+    def handler(pieces, page, page_num):
+        print(f"[{pdf_name}] 在第 {page_num} 頁找到 {len(pieces)} 張圖片")
+
+        image_infos = []
+        for img_num, img in enumerate(pieces, 1):
+            image_info = save_image(img, pdf_name, page_num, img_num, folder_name)
+            if image_info:
+                image_info["top"] = img["top"]
+                image_info["bottom"] = img["bottom"]
+                image_infos.append(image_info)
+        return image_infos
+
+    handler.cache_variant = "single_image"
+    handler.image_dir = folder_name
+    return handler
+
+
+def image_handler_for(
+    profile: LayoutProfile, pdf_name: str, folder_name: str = QUESTION_IMAGES_DIR
+) -> pdf_pages.ImageHandler:
+    """
+    依版面設定的 image_mode 取得 image_handler
+    """
+    if profile.image_mode == "single":
+        return single_image_handler(pdf_name, folder_name)
+    return pdf_pages.compose_image_handler(pdf_name, folder_name)
+
+
+def extract_answers_from_pdf(
+    file_path: str, profile: LayoutProfile, backend: str = None
+) -> list:
+    """
+    從答案 PDF 檔案中提取答案。
+
+    Args:
+        file_path (str): 答案 PDF 檔案的路徑。
+        profile (LayoutProfile): 版面設定
+        backend (str): 擷取後端，未指定則使用版面設定的 extraction_backend
+
+    Returns:
+        list: 答案列表。
+    """
+    compiled = compile_profile(profile)
+    try:
+        # 讀取 PDF 文字（有快取時直接由快取讀取）
+        content = pdf_pages.extract_text(
+            file_path, backend or profile.extraction_backend
+        )
+
+        rows = _ANSWER_ROW.findall(content)
+        if rows:
+            # 只在「答案」列中找答案，表頭與備註中的字母不會被當成答案
+            answers = compiled.answer_re.findall("\n".join(rows))
+            # 標為 ＃ 的題目改用備註中的更正答案，一律給分者維持 ＃（送分）
+            for number, answer in parse_notes(content).items():
+                if number <= len(answers) and answers[number - 1] == "＃":
+                    answers[number - 1] = answer
+        else:
+            # 使用正則表達式找出所有答案（包含全形和半形字母）
+            answers = compiled.answer_re.findall(content)
+
+            # 移除可能的開頭標記（如果存在）
+            if answers and answers[0] == "＃":
+                answers.pop(0)
+
+        return answers
+    except Exception as e:
+        print(f"解析答案檔案時發生錯誤：{str(e)}")
+        return []
+
+
+def find_question_positions(
+    words: list[dict], page_num: int, compiled: CompiledProfile, state: dict
+) -> dict:
+    """
+    找出一頁文字區塊中所有題號的位置
+
+    Args:
+        state (dict): 跨頁保存的題號狀態（last_number），由呼叫端建立並重複傳入
+
+    Returns:
+        dict: {題號: {"page": 頁碼, "top": TOP}}
+    """
+    sequential = compiled.profile.sequential_numbers
+    positions = {}
+    for word in words:
+        match = compiled.number_re.match(compiled.normalize(word["text"].strip()))
+        if not match:
+            continue
+        number = compiled.decode_number(match.group(1))
+
+        if sequential:
+            # 如果第一次碰到疑似題號的文字，卻不是1，表示該文字不是題號，跳過
+            if state.get("last_number") is None and number != "1":
+                continue
+
+            # 如果題號不是連續的，表示該文字不是題號，跳過
+            if state.get("last_number") and int(number) != state["last_number"] + 1:
+                continue
+
+            state["last_number"] = int(number)
+
+        # 儲存題號的頁碼和TOP至頁底距離
+        positions[number] = {"page": page_num, "top": word["top"]}
+    return positions
+
+
+def build_question(segment: segmenter.Segment, compiled: CompiledProfile) -> dict:
+    """
+    將切分出的題目整理為 {"number", "question", "choices", "images"}
+    """
+    profile = compiled.profile
+    number = compiled.decode_number(segment.number)
+    question = segment.question
+    choices = compiled.choice_re.findall(segment.choices_text)
+    if profile.strip_choices:
+        choices = [choice.strip() for choice in choices]
+    if profile.join_lines:
+        choices = [choice.replace("\n", "") for choice in choices]
+        question = question.replace("\n", "")
+    return {
+        "number": number,
+        "question": question.strip(),
+        "choices": choices,
+        "images": [],
+    }
+
+
+def parse_questions(
+    content: str, compiled: CompiledProfile, budget: segmenter.Budget = None
+) -> dict:
+    """
+    在全文中找出所有題目與選項
+
+    Args:
+        budget (segmenter.Budget): 切分題目的預算，超過時丟出 SegmentationBudgetExceeded
+
+    Returns:
+        dict: {題號: {"number", "question", "choices", "images"}}
+    """
+    content = compiled.clean(compiled.normalize(content))
+
+    questions_dict = {}
+    for segment in segmenter.segment_questions(
+        content, compiled.question_start_re, compiled.choice_start_re, budget
+    ):
+        question = build_question(segment, compiled)
+        questions_dict[question["number"]] = question
+    return questions_dict
+
+
+def assign_image(
+    anchors: QuestionAnchors, image_info: dict, pdf_name: str, mode: str = "preceding"
+) -> str:
+    """
+    取得圖片所屬的題號，之前沒有題號時回傳 None
+    """
+    print(f"[{pdf_name}] 處理第 {image_info['page']} 頁的圖片 {image_info['filename']}")
+
+    target_question = anchors.assign(image_info, mode)
+    if target_question is None:
+        print(f"[{pdf_name}] 圖片 {image_info['filename']} 之前沒有題號，略過")
+        return None
+
+    print(f"[{pdf_name}] 將圖片 {image_info['filename']} 加入題目 {target_question}")
+    return target_question
+
+
+def assign_images(
+    image_infos: list[dict],
+    question_positions: dict,
+    questions_dict: dict,
+    pdf_name: str,
+    mode: str = "preceding",
+):
+    """
+    將每張圖片分配給所屬的題目，分配方式見 question_anchors
+    """
+    anchors = QuestionAnchors(question_positions)
+    for image_info in image_infos:
+        target_question = assign_image(anchors, image_info, pdf_name, mode)
+
+        # 如果找到對應題目，加入圖片
+        if target_question in questions_dict:
+            questions_dict[target_question]["images"].append(image_info["filename"])
+
+
+def iter_questions(
+    file_path: str,
+    profile: LayoutProfile,
+    backend: str = None,
+    budget: segmenter.Budget = None,
+    image_dir: str = QUESTION_IMAGES_DIR,
+) -> Iterator[dict]:
+    """
+    逐題產生試題 PDF 中的題目
+
+    逐頁擷取文字，只保留尚未確定結束的最後一題（carry），出現下一個有選項的題目時
+    即產生前一題，記憶體用量與單題長度有關，不隨 PDF 頁數增加。
+    每頁文字只以 clean 整理一次（見 settle），結果與整份文字一次整理相同。
+    圖片在所在頁面處理時即依當時已知的題號位置分配，頁首頁尾以前幾頁判斷
+    （running_headers.iter_stripped_pages）。
+
+    Args:
+        file_path (str): 試題 PDF 檔案路徑
+        profile (LayoutProfile): 版面設定
+        backend (str): 擷取後端，未指定則使用版面設定的 extraction_backend
+        budget (segmenter.Budget): 整份文件共用的切分預算
+        image_dir (str): 圖片儲存區的資料夾
+
+    Yields:
+        dict: {"number", "question", "choices", "images", "pages": [起始頁, 結束頁]}，
+            依題目在 PDF 中出現的順序，題目文字為空的題目不產生
+    """
+    compiled = compile_profile(profile)
+    budget = budget or segmenter.Budget()
+    pdf_name = os.path.splitext(os.path.basename(file_path))[0]
+    anchors = QuestionAnchors()
+    number_state = {}  # 連續題號的檢查狀態
+    images = defaultdict(list)  # 已分配給各題號的圖片
+    carry = ""  # 尚未產生的題目文字（已整理）
+    carry_starts = []  # carry 中各頁文字的起始位置
+    carry_pages = []
+    pending = []  # 尚未整理的頁面：(頁碼, 轉換私有區字元後的文字)
+    settled_any = False  # 是否已有頁面整理過（之後的文字前面一定是換行）
+
+    def page_at(offset):
+        return carry_pages[max(bisect_right(carry_starts, offset) - 1, 0)]
+
+    def clean_appended(raw):
+        # 已整理的文字以換行結束，補上該換行讓 (?<=\n) 在開頭也能比對，整理後再去掉
+        if settled_any:
+            return compiled.clean("\n" + raw)[1:]
+        return compiled.clean(raw)
+
+    def settle():
+        """
+        整理 pending 中的頁面並接到 carry 之後
+
+        cleanups 只會合併由純數字行開始、跨越相鄰幾行的文字（例如 FIX_SPLIT_NUMBER），
+        因此最後一行不是純數字的頁面結尾之前的文字不會再被之後的頁面影響，
+        在此處分段整理與整份一次整理的結果相同；已整理的文字不會再被整理第二次。
+        """
+        nonlocal carry, settled_any
+        raw = ""
+        for page_num, text in pending:
+            carry_starts.append(len(carry) + len(clean_appended(raw) if raw else ""))
+            carry_pages.append(page_num)
+            raw += text
+        carry += clean_appended(raw)
+        settled_any = True
+        pending.clear()
+
+    def finish(segment):
+        question = build_question(segment, compiled)
+        question["images"] = list(images.get(question["number"], ()))
+        question["pages"] = [page_at(segment.start), page_at(segment.end - 1)]
+        return question
+
+    pages = pdf_pages.walk_pages(
+        file_path,
+        image_handler_for(profile, pdf_name, image_dir),
+        pdf_name,
+        backend or profile.extraction_backend,
+    )
+    if profile.strip_running_lines:
+        pages = running_headers.iter_stripped_pages(pages)
+
+    for page_data in pages:
+        page_num = page_data["page"]
+        positions = find_question_positions(
+            page_data["words"], page_num, compiled, number_state
+        )
+        for number, position in positions.items():
+            anchors.add(number, position["page"], position["top"])
+        for image_info in page_data["images"]:
+            target = assign_image(
+                anchors, image_info, pdf_name, profile.image_assignment
+            )
+            if target is not None:
+                images[target].append(image_info["filename"])
+
+        text = compiled.normalize(page_data["text"]) + "\n"
+        pending.append((page_num, text))
+        last_line = text.rstrip("\n").rsplit("\n", 1)[-1]
+        if _NUMERIC_LINE.fullmatch(last_line):
+            # 頁尾為純數字行時可能與下一頁合併，等下一頁一起整理
+            continue
+        settle()
+        segments = segmenter.segment_questions(
+            carry, compiled.question_start_re, compiled.choice_start_re, budget
+        )
+        if len(segments) < 2:
+            continue
+
+        # 最後一題可能延續到下一頁，其餘題目已確定結束
+        for segment in segments[:-1]:
+            question = finish(segment)
+            if question["question"]:
+                yield question
+
+        cut = segments[-1].start
+        carry = carry[cut:]
+        first = max(bisect_right(carry_starts, cut) - 1, 0)
+        carry_starts = [max(start - cut, 0) for start in carry_starts[first:]]
+        carry_pages = carry_pages[first:]
+
+    if pending:
+        settle()
+    for segment in segmenter.segment_questions(
+        carry, compiled.question_start_re, compiled.choice_start_re, budget
+    ):
+        question = finish(segment)
+        if question["question"]:
+            yield question
+
+
+def extract_questions_from_pdf(
+    file_path: str,
+    profile: LayoutProfile,
+    backend: str = None,
+    image_dir: str = QUESTION_IMAGES_DIR,
+) -> list[dict]:
+    """
+    從指定 PDF 檔案路徑的檔案中提取問題、題號、選項和圖片。
+
+    Args:
+        file_path (str): 試題 PDF 檔案路徑
+        profile (LayoutProfile): 版面設定
+        backend (str): 擷取後端，未指定則使用版面設定的 extraction_backend
+        image_dir (str): 圖片儲存區的資料夾
+
+    Returns:
+        list[dict]: 依題號排序的題目
+    """
+    questions = []
+    pdf_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    try:
+        print(f"\n[{pdf_name}] 開始解析試題PDF")
+
+        # 題號重複時以後出現的題目為準
+        questions_dict = {}
+        for question in iter_questions(
+            file_path, profile, backend, image_dir=image_dir
+        ):
+            questions_dict[question["number"]] = question
+        questions = list(questions_dict.values())
+
+        # 按題號排序
+        questions.sort(key=lambda x: int(x["number"]))
+
+        print(f"[{pdf_name}] 總共解析出 {len(questions)} 個題目")
+        for q in questions:
+            print(f"[{pdf_name}] 題號 {q['number']}: {len(q['images'])} 張圖片")
+
+    except FileNotFoundError:
+        print(f"[{pdf_name}] 錯誤：找不到檔案 {file_path}")
+    except segmenter.SegmentationBudgetExceeded as e:
+        # 交由 batch_runner 列入失敗清單
+        print(f"[{pdf_name}] 錯誤：切分題目超過預算：{e}")
+        raise
+    except Exception as e:
+        print(f"[{pdf_name}] 錯誤：解析 PDF 時發生錯誤：{str(e)}")
+        import traceback
+
+        print(traceback.format_exc())
+
+    return questions
+
+
+def answer_indexes(answer: str) -> list[int]:
+    """
+    將答案轉換為所有給分選項的索引
+
+    Args:
+        answer (str): 答案字母（可能是全形或半形），多個字母表示都給分（例如 BC），＃ 為送分
+
+    Returns:
+        list[int]: 給分選項的索引（0-based），送分時為空 list
+
+    Raises:
+        ValueError: 無法辨識的答案
+    """
+    # 全形字母與 ＃ 轉為半形，並移除字母間的空白與頓號
+    letters = re.sub(r"[\s,、]", "", unicodedata.normalize("NFKC", answer))
+    if letters == "#":
+        return []
+    if not letters or any(letter not in ANSWER_LETTERS for letter in letters):
+        raise ValueError(f"無法辨識的答案：{answer}")
+    return [ANSWER_LETTERS.index(letter) for letter in letters]
+
+
+def convert_answer_to_index(answer):
+    """
+    將答案字母（A、B、C、D）轉換為索引（0、1、2、3）
+
+    Args:
+        answer (str): 答案字母（可能是全形或半形）
+
+    Returns:
+        int: 答案在選項中的索引（0-based），多個字母時為第一個，＃ 為 GIVEN_ANSWER_INDEX
+
+    Raises:
+        ValueError: 無法辨識的答案
+    """
+    indexes = answer_indexes(answer)
+    return indexes[0] if indexes else GIVEN_ANSWER_INDEX
+
+
+def answer_fields(answer: str) -> dict:
+    """
+    題庫中每題的答案欄位，regex parser 與 Gemini 的結果都以此寫入 JSON
+
+    Returns:
+        dict: {"answer": 索引}，有多個給分選項時另有 {"answers": [索引, ...]}
+    """
+    indexes = answer_indexes(answer)
+    if len(indexes) > 1:
+        return {"answer": indexes[0], "answers": indexes}
+    return {"answer": indexes[0] if indexes else GIVEN_ANSWER_INDEX}
+
+
+def build_question_bank(questions: list, answers: list) -> list[dict]:
+    """
+    整合題目和答案
+    """
+    question_bank = []
+    for i, question in enumerate(questions):
+        if i < len(answers):
+            # 根據 schema 格式化題目資料
+            question_bank.append(
+                {
+                    "question": question["question"],
+                    "images": question["images"],  # 使用該題目對應的圖片
+                    "choices": question["choices"],
+                    **answer_fields(answers[i]),
+                }
+            )
+    return question_bank
+
+
+def process_exam_questions(
+    json_filename: str, profile: LayoutProfile, backend: str = None
+):
+    """
+    處理考試題目的主要函數
+    1. 讀取 JSON 檔案
+    2. 取得對應的 PDF 檔案
+    3. 解析 PDF 內容
+    4. 解析答案
+    5. 整合資訊並更新 JSON
+    """
+    # 讀取 JSON 檔案
+    json_path = os.path.join(QUESTION_JSON_DIR, json_filename)
+    print(f"\n=== 開始處理 {json_filename} ===")
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            exam_data = json.load(f)
+
+        # 取得試題和答案 PDF 檔案名稱
+        question_pdf = exam_data.get("試題檔案")
+        answer_pdf = exam_data.get("測驗式試題答案檔案")
+
+        if not question_pdf or not answer_pdf:
+            raise ValueError(f"[{json_filename}] 找不到試題檔案或答案檔案欄位")
+
+        # 組合完整的檔案路徑
+        question_path = os.path.join(QUESTION_BANK_DIR, question_pdf)
+        answer_path = os.path.join(QUESTION_BANK_DIR, answer_pdf)
+
+        print(f"[{json_filename}] 開始處理試題檔案：{question_pdf}")
+        questions = extract_questions_from_pdf(question_path, profile, backend)
+
+        print(f"[{json_filename}] 開始處理答案檔案：{answer_pdf}")
+        answers = extract_answers_from_pdf(answer_path, profile, backend)
+
+        # 整合題目和答案
+        question_bank = build_question_bank(questions, answers)
+
+        # 更新 JSON 檔案
+        exam_data["題庫"] = question_bank
+
+        # 寫回 JSON 檔案
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(exam_data, f, ensure_ascii=False, indent=2)
+
+        # 輸出處理結果
+        total_images = sum(len(q["images"]) for q in questions)
+        print(
+            f"[{json_filename}] 成功處理 {len(question_bank)} 個題目，包含 {total_images} 張圖片"
+        )
+        print(f"[{json_filename}] 資料已更新至檔案")
+
+    except FileNotFoundError as e:
+        print(f"[{json_filename}] 錯誤：{e}")
+    except json.JSONDecodeError:
+        print(f"[{json_filename}] 錯誤：JSON 檔案格式不正確")
+    except Exception as e:
+        print(f"[{json_filename}] 發生未預期的錯誤：{e}")
+    print(f"=== 完成處理 {json_filename} ===\n")
@@ -0,0 +1,220 @@
+"""
+PDF 文字擷取快取
+
+調整 process_exam_type0X.py 的 regex 時，每次都得重新以 pdfplumber 解析整批 PDF，
+每份要數秒，而 regex 本身只需要幾微秒。本模組將 pdf_pages.walk_pages 每頁擷取的
+文字、文字區塊、字元 top 與圖片資訊以 gzip 壓縮的 JSON lines（每行一頁）存在磁碟上，
+之後再解析同一份 PDF 時直接由快取讀取。寫入與讀取都逐頁進行，不需將整份 PDF 的頁面留在記憶體中。
+
+快取檔的第一行為標頭（頁數與圖片檔名），以獨立的 gzip member 寫在頁面之前
+（gzip 允許多個 member 串接，讀取時視為同一個串流），get 只需解壓標頭即可確認快取可用，
+不必先將整份快取解碼一次。
+
+快取 key 由 PDF 內容的 sha256、EXTRACTOR_VERSION 與圖片處理方式組成：
+- PDF 內容相同（即使檔名不同）即可共用快取
+- 修改 pdf_pages 的擷取邏輯時請遞增 EXTRACTOR_VERSION，舊的快取會自動失效
+- 圖片檔在第一次解析時已儲存，快取只記錄圖片資訊；圖片檔不存在時會重新解析
+
+使用方式：
+    python -m regular_expression_parser.extraction_cache stats
+    python -m regular_expression_parser.extraction_cache clear
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Iterator
+
+EXTRACTOR_VERSION = 6
+DEFAULT_CACHE_DIR = ".extraction_cache"
+
+# 快取中每個文字區塊只保留的欄位
+WORD_KEYS = ("text", "x0", "x1", "top", "bottom")
+
+
+def compact_page(page_data: dict) -> dict:
+    """
+    產生寫入快取用的頁面資料，文字區塊只保留 WORD_KEYS 欄位
+    """
+    return {
+        **page_data,
+        "words": [
+            {k: word[k] for k in WORD_KEYS if k in word} for word in page_data["words"]
+        ],
+    }
+
+
+def _mkstemp(path: str, suffix: str) -> str:
+    """
+    在 path 所在的資料夾建立暫存檔，檔名每次都不同，多個 thread 同時寫入同一個快取也不會互相覆蓋
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=suffix
+    )
+    os.close(fd)
+    return tmp_path
+
+
+class CachedPages:
+    """
+    標頭可讀取的快取檔，每次走訪都重新由檔案逐頁讀取（跳過標頭）
+    """
+
+    def __init__(self, path: str, page_count: int, image_filenames: list[str]):
+        self.path = path
+        self.page_count = page_count
+        self.image_filenames = image_filenames  # 快取中記錄的圖片檔名
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def __iter__(self) -> Iterator[dict]:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            next(f)  # 標頭
+            for line in f:
+                yield json.loads(line)
+
+
+class CacheWriter:
+    """
+    逐頁寫入快取：先寫入暫存檔，commit 時在前面加上標頭再取代快取檔，未 commit 即關閉時刪除暫存檔
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.page_count = 0
+        self.image_filenames = []
+        self.tmp_path = _mkstemp(path, ".part")
+        self._file = gzip.open(self.tmp_path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, page_data: dict):
+        """
+        寫入一頁，文字區塊只保留 WORD_KEYS 欄位
+        """
+        json.dump(
+            compact_page(page_data),
+            self._file,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        self._file.write("\n")
+        self.page_count += 1
+        self.image_filenames.extend(image["filename"] for image in page_data["images"])
+
+    def commit(self):
+        """
+        將標頭與已寫入的頁面合併為快取檔
+        """
+        self._file.close()
+        header = json.dumps(
+            {"pages": self.page_count, "images": self.image_filenames},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        entry_tmp_path = _mkstemp(self.path, ".part")
+        try:
+            with open(entry_tmp_path, "wb") as out, open(self.tmp_path, "rb") as pages:
+                out.write(gzip.compress((header + "\n").encode("utf-8")))
+                shutil.copyfileobj(pages, out)
+            os.replace(entry_tmp_path, self.path)
+        except BaseException:
+            os.remove(entry_tmp_path)
+            raise
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ExtractionCache:
+    """
+    以 PDF 內容 hash 為 key 的逐頁擷取結果快取
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        self.root = root
+
+    def cache_key(self, pdf_sha256: str, variant: str) -> str:
+        """
+        組合快取 key：PDF 內容 hash、擷取版本與圖片處理方式
+        """
+        raw = f"{pdf_sha256}:{EXTRACTOR_VERSION}:{variant}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        """
+        回傳快取檔路徑，以 key 前兩碼分層避免單一資料夾檔案過多
+        """
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def get(self, key: str) -> CachedPages:
+        """
+        讀取快取檔的標頭，不存在或無法讀取時回傳 None
+        """
+        path = self.entry_path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+            return CachedPages(path, header["pages"], header["images"])
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"快取檔損毀，將重新解析：{path}：{e}")
+            return None
+
+    def writer(self, key: str) -> CacheWriter:
+        """
+        開始逐頁寫入快取
+        """
+        return CacheWriter(self.entry_path(key))
+
+    def stats(self) -> tuple[int, int]:
+        """
+        Returns:
+            tuple[int, int]: (快取檔數, 總位元組數)
+        """
+        files = 0
+        size = 0
+        if not os.path.isdir(self.root):
+            return files, size
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                files += 1
+                size += entry.stat().st_size
+        return files, size
+
+    def clear(self):
+        """
+        清除所有快取
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF 文字擷取快取")
+    parser.add_argument("--root", default=DEFAULT_CACHE_DIR, help="快取目錄")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = ExtractionCache(args.root)
+    if args.command == "stats":
+        files, size = cache.stats()
+        print(f"共 {files} 個快取檔，{size / (1024 * 1024):.1f} MB")
+    else:
+        cache.clear()
+        print(f"已清除 {args.root}")
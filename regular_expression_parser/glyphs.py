@@ -0,0 +1,42 @@
+"""
+私有區（PUA）字元正規化
+
+考選部試題 PDF 的字型以私有區字元表示題號與選項符號，例如 \ue0c6 ~ \ue0cf 為題號 1 ~ 10、
+\ue18c ~ \ue18f 為選項 (A) ~ (D)。原本各 parser 以多次 re.sub 與逐字查表處理這些字元，
+且每個 regex 都直接寫私有區字元。
+
+本模組為每種字型建立一次 str.translate 對照表，將已知的私有區字元一次轉換為
+Unicode 中對應的符號（題號為 ① ~ ⑩、選項為 Ⓐ ~ Ⓓ），profiles 中的 regex 再以轉換後的文字撰寫。
+每個字元都轉換為單一字元，轉換前後的文字長度與位置相同，字元的 top 仍可對應。
+"""
+
+# 題號 1 ~ 10
+CIRCLED_NUMBERS = "①②③④⑤⑥⑦⑧⑨⑩"
+# 選項 A ~ D
+CIRCLED_CHOICES = "ⒶⒷⒸⒹ"
+
+# 各字型的私有區字元對照
+GLYPH_MAPS = {
+    "moex": {
+        **{chr(0xE0C6 + i): token for i, token in enumerate(CIRCLED_NUMBERS)},
+        **{chr(0xE18C + i): token for i, token in enumerate(CIRCLED_CHOICES)},
+    },
+}
+
+# 各字型的 str.translate 對照表，只在 import 時建立一次
+GLYPH_TABLES = {
+    family: str.maketrans(mapping) for family, mapping in GLYPH_MAPS.items()
+}
+
+
+def normalize(text: str, family: str) -> str:
+    """
+    將文字中已知的私有區字元轉換為對應的符號
+
+    Args:
+        text (str): 文字內容
+        family (str): 字型名稱（GLYPH_TABLES 的 key），None 表示不轉換
+    """
+    if family is None:
+        return text
+    return text.translate(GLYPH_TABLES[family])
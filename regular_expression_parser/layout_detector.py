@@ -0,0 +1,196 @@
+"""
+試題 PDF 版面自動判斷
+
+原本要依各 process_exam_type0X.py 開頭註解中的條件（考試名稱、類科、考試代碼等）
+人工判斷每份 fse 記錄該用哪個 parser，再於 work.ipynb 中將 JSON 複製到 question_json。
+本模組只讀取試題 PDF 的前幾頁，以 profiles.LayoutProfile 的 signatures / rejects 判斷版面：
+題號是 1.、數字或私有區字元，選項是 A. 或私有區字元，以及代號／頁次的頁首格式。
+
+route 依試題 PDF 分組（同一份 PDF 只判斷一次），將 question_json 中的 JSON 依版面分類後
+寫入 routes 檔，batch_runner 以 --routes 讀取後即可處理該版面的全部 JSON。
+
+使用方式（於專案根目錄執行）：
+    python -m regular_expression_parser.layout_detector detect question_bank/xxx.pdf
+    python -m regular_expression_parser.layout_detector route --jobs 8
+    python -m regular_expression_parser.batch_runner type02 --routes layout_routes.json
+"""
+
+import argparse
+import json
+import os
+import re
+from multiprocessing import Pool
+
+import pdfplumber
+
+from blob_store import BlobStore
+from regular_expression_parser import batch_runner
+from regular_expression_parser.engine import QUESTION_BANK_DIR, QUESTION_JSON_DIR
+from regular_expression_parser.profiles import PROFILES
+
+DEFAULT_MAX_PAGES = 2
+DEFAULT_ROUTES_PATH = "layout_routes.json"
+
+# 無法判斷版面（沒有符合或有多個同樣符合的版面）與找不到試題 PDF 的分類
+UNKNOWN = "unknown"
+MISSING = "missing"
+
+_SIGNATURES = {
+    name: (
+        [re.compile(pattern, re.MULTILINE) for pattern in profile.signatures],
+        [re.compile(pattern, re.MULTILINE) for pattern in profile.rejects],
+    )
+    for name, profile in PROFILES.items()
+    if profile.signatures
+}
+
+
+def read_first_pages(file_path: str, max_pages: int = DEFAULT_MAX_PAGES) -> str:
+    """
+    取得 PDF 前 max_pages 頁的文字內容，其餘頁面不會被解析
+    """
+    with pdfplumber.open(file_path, pages=range(1, max_pages + 1)) as pdf:
+        return "".join((page.extract_text() or "") + "\n" for page in pdf.pages)
+
+
+def match_layouts(text: str) -> list[str]:
+    """
+    找出 signatures 全部符合且 rejects 都不符合的版面，依符合的 signatures 數由多到少排序
+    """
+    candidates = []
+    for name, (signatures, rejects) in _SIGNATURES.items():
+        if all(sig.search(text) for sig in signatures) and not any(
+            rej.search(text) for rej in rejects
+        ):
+            candidates.append(name)
+    candidates.sort(key=lambda name: len(_SIGNATURES[name][0]), reverse=True)
+    return candidates
+
+
+def detect_layout(text: str) -> str:
+    """
+    判斷文字內容的版面
+
+    Returns:
+        str: 版面名稱（type01 ~ type05），無法判斷時回傳 UNKNOWN
+    """
+    candidates = match_layouts(text)
+    if not candidates:
+        return UNKNOWN
+    # 條件較多（較明確）的版面優先，條件數相同則無法判斷
+    if len(candidates) > 1 and len(_SIGNATURES[candidates[0]][0]) == len(
+        _SIGNATURES[candidates[1]][0]
+    ):
+        return UNKNOWN
+    return candidates[0]
+
+
+def detect_pdf_layout(file_path: str, max_pages: int = DEFAULT_MAX_PAGES) -> str:
+    """
+    判斷試題 PDF 的版面，只讀取前 max_pages 頁
+    """
+    if not os.path.exists(file_path):
+        return MISSING
+    return detect_layout(read_first_pages(file_path, max_pages))
+
+
+def _detect_group(args: tuple) -> tuple[str, str]:
+    question_key, file_path, max_pages = args
+    try:
+        return question_key, detect_pdf_layout(file_path, max_pages)
+    except Exception as e:
+        print(f"[{os.path.basename(file_path)}] 無法判斷版面：{e}")
+        return question_key, UNKNOWN
+
+
+def route_json_files(
+    json_filenames: list[str] = None,
+    json_dir: str = QUESTION_JSON_DIR,
+    bank_dir: str = QUESTION_BANK_DIR,
+    jobs: int = 1,
+    max_pages: int = DEFAULT_MAX_PAGES,
+) -> dict[str, list[str]]:
+    """
+    依試題 PDF 的版面將 JSON 分類，共用同一份試題 PDF 的 JSON 只判斷一次
+
+    Args:
+        json_filenames (list[str]): 要分類的 JSON 檔名，未指定則分類資料夾中全部
+        jobs (int): 同時判斷的 process 數
+
+    Returns:
+        dict[str, list[str]]: {版面名稱: [JSON 檔名]}，另有 UNKNOWN 與 MISSING 兩類
+    """
+    if json_filenames is None:
+        json_filenames = sorted(f for f in os.listdir(json_dir) if f.endswith(".json"))
+
+    store = BlobStore(os.path.join(bank_dir, ".blobs"))
+    groups = batch_runner.group_by_question_pdf(
+        json_filenames, json_dir, bank_dir, store
+    )
+    tasks = [
+        (question_key, records[0]["question_path"], max_pages)
+        for question_key, records in groups.items()
+    ]
+
+    if jobs > 1:
+        with Pool(jobs) as pool:
+            layouts = dict(pool.imap_unordered(_detect_group, tasks, chunksize=16))
+    else:
+        layouts = dict(map(_detect_group, tasks))
+
+    routes = {}
+    for question_key, records in groups.items():
+        routes.setdefault(layouts[question_key], []).extend(
+            record["json_filename"] for record in records
+        )
+    for json_filenames_in_layout in routes.values():
+        json_filenames_in_layout.sort()
+    return dict(sorted(routes.items()))
+
+
+def load_routes(routes_path: str, layout: str) -> list[str]:
+    """
+    讀取 routes 檔中某個版面的 JSON 檔名
+    """
+    with open(routes_path, "r", encoding="utf-8") as f:
+        return json.load(f).get(layout, [])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="試題 PDF 版面自動判斷")
+    arg_parser.add_argument(
+        "--max-pages", type=int, default=DEFAULT_MAX_PAGES, help="讀取的頁數"
+    )
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    detect_parser = subparsers.add_parser("detect", help="判斷試題 PDF 的版面")
+    detect_parser.add_argument("pdf_files", nargs="+")
+
+    route_parser = subparsers.add_parser("route", help="將 JSON 依版面分類")
+    route_parser.add_argument("json_files", nargs="*", help="要分類的 JSON 檔名")
+    route_parser.add_argument("--json-dir", default=QUESTION_JSON_DIR)
+    route_parser.add_argument("--bank-dir", default=QUESTION_BANK_DIR)
+    route_parser.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count(), help="同時執行的 process 數"
+    )
+    route_parser.add_argument(
+        "--output", default=DEFAULT_ROUTES_PATH, help="分類結果的 routes 檔"
+    )
+    args = arg_parser.parse_args()
+
+    if args.command == "detect":
+        for pdf_file in args.pdf_files:
+            print(f"{pdf_file}: {detect_pdf_layout(pdf_file, args.max_pages)}")
+    else:
+        routes = route_json_files(
+            args.json_files or None,
+            args.json_dir,
+            args.bank_dir,
+            args.jobs,
+            args.max_pages,
+        )
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(routes, f, ensure_ascii=False, indent=2)
+        for layout, json_filenames in routes.items():
+            print(f"{layout}: {len(json_filenames)} 個 JSON")
+        print(f"分類結果已寫入 {args.output}")
@@ -0,0 +1,206 @@
+"""
+試題 PDF 的逐頁讀取
+
+原本各 process_exam_type0X.py 的 extract_questions_from_pdf 會走訪 pdf.pages 兩次：
+第一次取文字與題號位置，第二次取圖片，每頁的 layout 物件被建立後又再走訪一次，
+且 pdfplumber 的每頁快取在整份 PDF 關閉前都不會釋放。
+
+walk_pages 改為只走訪一次，每頁同時取出文字區塊、文字內容與圖片，
+處理完即清除該頁的快取，記憶體用量不會隨頁數增加。
+
+page.extract_words() 與 page.extract_text() 會各自對同一份 page.chars 做一次字元分群，
+analyze_page 只分群一次，再由同一份結果產生文字區塊與文字內容（結果與兩者完全相同），
+並保留文字中每個字元的 top。
+
+擷取結果會逐頁寫入 extraction_cache，同一份 PDF 再次解析時直接由快取逐頁讀取。
+
+擷取後端可選擇 pdfplumber（預設）或 poppler（見 poppler_backend.py），
+各 process_exam_type0X.py 以 EXTRACTION_BACKEND 設定。
+"""
+
+import os
+from contextlib import nullcontext
+from typing import Callable, Iterator
+
+import pdfplumber
+from pdfplumber.utils.text import WordExtractor
+
+import util
+from download_manifest import file_sha256
+from regular_expression_parser import poppler_backend
+from regular_expression_parser.extraction_cache import ExtractionCache
+
+# image_handler(page.images, page, page_num) -> list[dict]
+# 回傳的每張圖片資訊至少需包含 filename、top 與 page
+# 要使用快取的 image_handler 需設定 cache_variant（圖片處理方式）與 image_dir（圖片目錄）屬性
+ImageHandler = Callable[[list[dict], pdfplumber.page.Page, int], list[dict]]
+
+BACKENDS = ("pdfplumber", "poppler")
+DEFAULT_BACKEND = "pdfplumber"
+
+# 是否使用擷取快取，batch_runner --no-cache 會將其關閉
+USE_EXTRACTION_CACHE = True
+extraction_cache = ExtractionCache()
+
+_poppler_warned = False
+
+
+def compose_image_handler(pdf_name: str, folder_name: str) -> ImageHandler:
+    """
+    以 util.compose_images 合併並儲存圖片的 image_handler
+    """
+
+    def handler(pieces, page, page_num):
+        print(f"[{pdf_name}] 在第 {page_num} 頁找到 {len(pieces)} 張圖片")
+        return util.compose_images(pieces, page, pdf_name, page_num, folder_name)
+
+    handler.cache_variant = "compose_images"
+    handler.image_dir = folder_name
+    return handler
+
+
+def analyze_page(page: pdfplumber.page.Page) -> tuple[list[dict], str, list]:
+    """
+    對頁面字元只分群一次，同時取得文字區塊與文字內容
+
+    Returns:
+        tuple[list[dict], str, list]: (與 page.extract_words() 相同的文字區塊,
+            與 page.extract_text() 相同的文字內容, 文字中每個字元的 top)
+            版面補上的空白與換行沒有對應的字元，top 為 None
+    """
+    wordmap = WordExtractor().extract_wordmap(page.chars)
+    words = [word for word, _ in wordmap.tuples]
+    # 參數與 page.extract_text() 預設使用的 page.get_textmap() 相同
+    textmap = wordmap.to_textmap(
+        layout_bbox=page.bbox,
+        layout_width=page.width,
+        layout_height=page.height,
+        presorted=True,
+    )
+    tops = [char["top"] if char else None for _, char in textmap.tuples]
+    return words, textmap.as_string, tops
+
+
+def _cache_variant(image_handler: ImageHandler) -> str:
+    """
+    取得快取 key 中的圖片處理方式，無法使用快取時回傳 None
+    """
+    if image_handler is None:
+        return "text"
+    return getattr(image_handler, "cache_variant", None)
+
+
+def _cached_images_exist(filenames: list[str], image_handler: ImageHandler) -> bool:
+    """
+    檢查快取中記錄的圖片檔是否都還在
+    """
+    if image_handler is None:
+        return True
+    return all(
+        os.path.exists(os.path.join(image_handler.image_dir, filename))
+        for filename in filenames
+    )
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    檢查擷取後端名稱；指定 poppler 但未安裝時退回 pdfplumber
+    """
+    global _poppler_warned
+
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"未知的擷取後端：{backend}，可用的後端：{', '.join(BACKENDS)}"
+        )
+    if backend == "poppler" and not poppler_backend.is_available():
+        if not _poppler_warned:
+            print("找不到 pdftotext/pdfimages（poppler-utils），改用 pdfplumber")
+            _poppler_warned = True
+        return "pdfplumber"
+    return backend
+
+
+def _iter_pdfplumber_pages(
+    file_path: str, image_handler: ImageHandler = None
+) -> Iterator[dict]:
+    """
+    以 pdfplumber 逐頁擷取，每頁處理完即釋放快取
+    """
+    with pdfplumber.open(file_path) as pdf:
+        for page_num, page in enumerate(pdf.pages, 1):
+            images = []
+            if image_handler and page.images:
+                images = image_handler(page.images, page, page_num)
+
+            words, text, tops = analyze_page(page)
+            yield {
+                "page": page_num,
+                "words": words,
+                "text": text,
+                "tops": tops,
+                "images": images,
+            }
+
+            # 釋放該頁的 layout 快取
+            page.close()
+
+
+def walk_pages(
+    file_path: str,
+    image_handler: ImageHandler = None,
+    pdf_name: str = None,
+    backend: str = DEFAULT_BACKEND,
+) -> Iterator[dict]:
+    """
+    逐頁讀取 PDF，每頁只走訪一次
+
+    Args:
+        file_path (str): PDF 檔案路徑
+        image_handler (ImageHandler): 處理該頁圖片的函式，未指定則不處理圖片
+        pdf_name (str): 輸出訊息用的名稱，未指定則不輸出
+        backend (str): 擷取後端，pdfplumber 或 poppler
+
+    Yields:
+        dict: {"page": 頁碼(1-based), "words": 文字區塊, "text": 文字內容,
+            "tops": 文字中每個字元的 top, "images": image_handler 回傳的圖片資訊}
+            由快取或 poppler 讀取時，文字區塊只包含 extraction_cache.WORD_KEYS 欄位
+    """
+    backend = resolve_backend(backend)
+
+    key = None
+    variant = _cache_variant(image_handler)
+    if USE_EXTRACTION_CACHE and variant:
+        key = extraction_cache.cache_key(file_sha256(file_path), f"{backend}:{variant}")
+        pages = extraction_cache.get(key)
+        if pages is not None and _cached_images_exist(
+            pages.image_filenames, image_handler
+        ):
+            if pdf_name:
+                print(f"[{pdf_name}] 由快取讀取 {len(pages)} 頁")
+            yield from pages
+            return
+
+    if backend == "poppler":
+        page_iter = poppler_backend.iter_pages(file_path, image_handler)
+    else:
+        page_iter = _iter_pdfplumber_pages(file_path, image_handler)
+
+    # 逐頁寫入快取，沒有走訪完整份 PDF 時不會留下快取檔
+    with extraction_cache.writer(key) if key else nullcontext() as writer:
+        for page_data in page_iter:
+            if pdf_name:
+                print(f"[{pdf_name}] 處理第 {page_data['page']} 頁")
+            if writer:
+                writer.write(page_data)
+            yield page_data
+        if writer:
+            writer.commit()
+
+
+def extract_text(file_path: str, backend: str = DEFAULT_BACKEND) -> str:
+    """
+    取得整份 PDF 的文字內容，等同於將每頁 page.extract_text() 加上換行後串接
+    """
+    return "".join(
+        page_data["text"] + "\n" for page_data in walk_pages(file_path, backend=backend)
+    )
@@ -0,0 +1,151 @@
+"""
+poppler 擷取後端
+
+Q1.py 與 A1.py 直接呼叫 pdftotext，速度比 pdfplumber 快一個數量級。本模組以 poppler
+產生與 pdf_pages.walk_pages 相同結構的逐頁資料（words / text / tops / images）：
+
+1. 文字區塊：pdftotext -bbox-layout 輸出每個字的座標（左上角為原點，與 pdfplumber 的 top 相同）
+2. 文字內容：將文字區塊依 top 分行（容許誤差與 pdfplumber 預設相同），行內依 x0 排序並以空白串接
+3. 圖片：pdfimages -list 只列出圖片所在頁與尺寸，沒有頁面上的位置，
+   因此只用來找出有圖片的頁，這些頁再以 pdfplumber 取得圖片位置與內容交給 image_handler
+
+需要安裝 poppler-utils（macOS: brew install poppler）。
+"""
+
+import os
+import shutil
+import subprocess
+import xml.etree.ElementTree as ET
+from operator import itemgetter
+from typing import Iterator
+
+import pdfplumber
+from pdfplumber.utils import cluster_objects
+
+# 與 pdfplumber 預設的 y_tolerance 相同
+Y_TOLERANCE = 3
+
+
+def is_available() -> bool:
+    """
+    檢查是否已安裝 pdftotext 與 pdfimages
+    """
+    return (
+        shutil.which("pdftotext") is not None and shutil.which("pdfimages") is not None
+    )
+
+
+def _local_name(tag: str) -> str:
+    """
+    去除 XHTML namespace，例如 {http://www.w3.org/1999/xhtml}word -> word
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_bbox_layout(file_path: str) -> list[list[dict]]:
+    """
+    以 pdftotext -bbox-layout 取得每頁的文字區塊
+
+    Returns:
+        list[list[dict]]: 每頁的文字區塊列表，欄位為 text、x0、x1、top、bottom
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(file_path)
+    result = subprocess.run(
+        ["pdftotext", "-bbox-layout", file_path, "-"],
+        capture_output=True,
+        check=True,
+    )
+
+    pages = []
+    for element in ET.fromstring(result.stdout).iter():
+        name = _local_name(element.tag)
+        if name == "page":
+            pages.append([])
+        elif name == "word" and pages and element.text:
+            pages[-1].append(
+                {
+                    "text": element.text,
+                    "x0": float(element.get("xMin")),
+                    "x1": float(element.get("xMax")),
+                    "top": float(element.get("yMin")),
+                    "bottom": float(element.get("yMax")),
+                }
+            )
+    return pages
+
+
+def pages_with_images(file_path: str) -> set[int]:
+    """
+    以 pdfimages -list 找出有圖片的頁碼（1-based）
+    """
+    result = subprocess.run(
+        ["pdfimages", "-list", file_path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    pages = set()
+    # 前兩行為標題與分隔線，之後每行第一欄為頁碼
+    for line in result.stdout.splitlines()[2:]:
+        fields = line.split()
+        if fields and fields[0].isdigit():
+            pages.add(int(fields[0]))
+    return pages
+
+
+def words_to_text(words: list[dict]) -> tuple[str, list]:
+    """
+    將文字區塊組成文字內容，換行與空白的規則與 pdfplumber 的 extract_text() 相同
+
+    Returns:
+        tuple[str, list]: (文字內容, 文字中每個字元的 top)
+    """
+    parts = []
+    tops = []
+    for line_index, line in enumerate(
+        cluster_objects(words, itemgetter("top"), Y_TOLERANCE)
+    ):
+        if line_index:
+            parts.append("\n")
+            tops.append(None)
+        for word_index, word in enumerate(sorted(line, key=itemgetter("x0"))):
+            if word_index:
+                parts.append(" ")
+                tops.append(None)
+            parts.append(word["text"])
+            tops.extend([word["top"]] * len(word["text"]))
+    return "".join(parts), tops
+
+
+def iter_pages(file_path: str, image_handler=None) -> Iterator[dict]:
+    """
+    逐頁產生與 pdf_pages.walk_pages 相同結構的資料
+
+    整份 PDF 只呼叫一次 pdftotext；只有 pdfimages 列出有圖片的頁才會以 pdfplumber 開啟。
+    """
+    page_words = read_bbox_layout(file_path)
+    image_pages = pages_with_images(file_path) if image_handler else set()
+
+    pdf = pdfplumber.open(file_path) if image_pages else None
+    try:
+        for page_num, words in enumerate(page_words, 1):
+            images = []
+            if page_num in image_pages:
+                page = pdf.pages[page_num - 1]
+                if page.images:
+                    images = image_handler(page.images, page, page_num)
+                page.close()
+
+            text, tops = words_to_text(words)
+            yield {
+                "page": page_num,
+                "words": words,
+                "text": text,
+                "tops": tops,
+                "images": images,
+            }
+    finally:
+        if pdf is not None:
+            pdf.close()
@@ -0,0 +1,176 @@
+"""
+試題版面設定（layout profile）
+
+process_exam_type01.py ~ type05.py 原本是各約 300 行、幾乎相同的複本，差別只在：
+題號的 regex、題號字元的對照表、移除頁首與錯誤換行的 re.sub、題目與選項的 regex。
+這些差異改以 LayoutProfile 宣告於此，共用的擷取、圖片與答案流程則在 engine.py。
+
+新增一種版面只需要在 PROFILES 加入一個 LayoutProfile。
+"""
+
+from dataclasses import dataclass, field
+
+from regular_expression_parser.glyphs import CIRCLED_NUMBERS
+
+
+@dataclass(frozen=True)
+class Substitution:
+    """在全文上執行的一次 re.sub"""
+
+    pattern: str
+    repl: str = ""
+    flags: int = 0
+
+
+@dataclass(frozen=True)
+class LayoutProfile:
+    """
+    一種試題 PDF 版面的解析設定
+
+    Attributes:
+        name: 版面名稱
+        description: 適用的考試
+        number_pattern: 判斷文字區塊是否為題號的 regex，group(1) 為題號字元
+        question_start: 題號行的 regex，以 re.match 比對每行行首，group(1) 為題號字元（見 segmenter.py）
+        choice_start: 第一個選項行的 regex，以 re.match 比對每行行首
+        choice_pattern: 在選項區中找出每個選項的 regex
+        number_map: 題號字元的對照表，例如 ① -> "1"
+        sequential_numbers: 題號是否必須從 1 開始且連續，不連續的視為一般文字
+        cleanups: 找題目前依序在全文上執行的 re.sub
+        strip_choices: 是否去除選項前後的空白
+        join_lines: 是否移除題目與選項中的換行
+        answer_pattern: 在答案 PDF 中找出答案的 regex，＃ 為送分的題目
+        image_mode: compose（以 util.compose_images 合併同一欄的圖片）或 single（逐張儲存）
+        extraction_backend: PDF 擷取後端，pdfplumber 或 poppler
+        glyph_family: 私有區字元的字型（見 glyphs.py），設定後題號與全文會先轉換私有區字元，
+            number_pattern、question_start 等 regex 以轉換後的符號撰寫
+        image_assignment: 圖片分配方式，preceding 或 overlap（見 question_anchors.py）
+        strip_running_lines: 是否以座標移除各頁重複的頁首與頁尾（見 running_headers.py）
+        signatures: layout_detector 判斷版面用的 regex，前幾頁的文字須全部符合
+        rejects: 前幾頁的文字符合任一個即不是此版面的 regex
+    """
+
+    name: str
+    description: str
+    number_pattern: str
+    question_start: str
+    choice_start: str
+    choice_pattern: str
+    number_map: dict = field(default_factory=dict)
+    sequential_numbers: bool = True
+    cleanups: tuple = ()
+    strip_choices: bool = True
+    join_lines: bool = False
+    answer_pattern: str = r"[ABCDEＡＢＣＤＥ＃#]"
+    image_mode: str = "compose"
+    extraction_backend: str = "pdfplumber"
+    glyph_family: str = None
+    image_assignment: str = "preceding"
+    strip_running_lines: bool = True
+    signatures: tuple = ()
+    rejects: tuple = ()
+
+
+# 私有區（PUA）字元的選項符號 \ue18c ~ \ue18f 轉換後為 Ⓐ ~ Ⓓ
+CIRCLED_CHOICE_PATTERN = r"(?sm)[Ⓐ-Ⓓ](.*?)(?=[Ⓐ-Ⓓ]|\Z)"
+
+# 移除題號前的錯誤換行符號，將\n2\n33轉換成\n33
+FIX_SPLIT_NUMBER = Substitution(r"(?<=\n)(\d+)\n(\d+)", r"\2")
+# 移除題號前的錯誤換行符號，例如將\n4 3\n63轉換成\n63
+FIX_SPLIT_NUMBER_PAIR = Substitution(r"(?<=\n)(\d+\s+\d+)\n(\d+)", r"\2")
+
+# 版面判斷用的特徵（以 re.MULTILINE 比對前幾頁的文字）
+SIG_DOT_NUMBER = r"^\d+\.\s*\S"  # 題號為 1.
+SIG_DOT_CHOICE = r"^A\.\s*\S"  # 選項為 A.
+SIG_PLAIN_NUMBER = r"^\d{1,3} \S"  # 題號為數字加空白
+SIG_PUA_CHOICE = r"[\ue18c-\ue18f]"  # 選項為私有區字元
+SIG_PUA_NUMBER = r"^[\ue0c6-\ue0cf]"  # 題號為私有區字元
+SIG_PAGE_HEADER = r"代號：[^\n]+\n頁次："  # 代號與頁次相鄰
+SIG_SPLIT_PAGE_HEADER = r"代號：[^\n]+\n[^\n]+\n頁次："  # 代號與頁次之間多一行
+SIG_PAGE_COUNT = r"頁次："  # 有頁次
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        LayoutProfile(
+            name="type01",
+            description="fse00000001 ~ fse00000121，題號為 1.、選項為 A.",
+            number_pattern=r"^(\d+)\.",
+            question_start=r"(\d+)\.\s*",
+            choice_start=r"A\.",
+            choice_pattern=r"[A-D]\.\s*([^\n]+)",
+            sequential_numbers=False,
+            strip_choices=False,
+            answer_pattern=r"[ＡＢＣＤ＃]",
+            image_mode="single",
+            signatures=(SIG_DOT_NUMBER, SIG_DOT_CHOICE),
+            rejects=(SIG_PUA_CHOICE, SIG_PAGE_COUNT),
+        ),
+        LayoutProfile(
+            name="type02",
+            description="初等考試、醫事檢驗師(101030/101110/102030)、中醫師，題號為數字、選項為私有區字元",
+            number_pattern=r"^(\d+)$",
+            question_start=r"\s*(\d+)(?:\s+|$)",
+            choice_start=r"Ⓐ",
+            choice_pattern=CIRCLED_CHOICE_PATTERN,
+            glyph_family="moex",
+            cleanups=(
+                # 將\n{數字}\nⒶ 轉換為\nⒶ
+                Substitution(r"(?<=\n)(\d+)\n([ⒶⒷⒸⒹ])", r"\2"),
+                FIX_SPLIT_NUMBER,
+                # 例如將\n2 2\nⒸ轉換成\nⒸ
+                Substitution(r"(?<=\n)(\d+\s+\d+)\n([ⒶⒷⒸⒹ])", r"\2"),
+                FIX_SPLIT_NUMBER_PAIR,
+            ),
+            signatures=(SIG_PLAIN_NUMBER, SIG_PUA_CHOICE, SIG_PAGE_HEADER),
+            rejects=(SIG_PUA_NUMBER,),
+        ),
+        LayoutProfile(
+            name="type03",
+            description="醫事檢驗師(102100 ~ 114020)，題號為 1.、選項為 A.",
+            number_pattern=r"^(\d+)\.",
+            question_start=r"\s*(\d+)\.\s*",
+            choice_start=r"A\.",
+            choice_pattern=r"(?sm)[ABCDE]\.(.*?)(?=[ABCDE]\.|\Z)",
+            cleanups=(
+                FIX_SPLIT_NUMBER,
+                FIX_SPLIT_NUMBER_PAIR,
+            ),
+            signatures=(SIG_DOT_NUMBER, SIG_DOT_CHOICE, SIG_PAGE_COUNT),
+            rejects=(SIG_PUA_CHOICE,),
+        ),
+        LayoutProfile(
+            name="type04",
+            description="101 年關務人員考試國文，題號與選項皆為私有區字元",
+            number_pattern=r"^([①-⑩]).+$",
+            number_map={token: str(i) for i, token in enumerate(CIRCLED_NUMBERS, 1)},
+            question_start=r"([①-⑩])",
+            choice_start=r"Ⓐ",
+            choice_pattern=CIRCLED_CHOICE_PATTERN,
+            glyph_family="moex",
+            cleanups=(
+                FIX_SPLIT_NUMBER,
+                FIX_SPLIT_NUMBER_PAIR,
+            ),
+            join_lines=True,
+            signatures=(SIG_PUA_NUMBER, SIG_PUA_CHOICE),
+            rejects=(SIG_DOT_CHOICE,),
+        ),
+        LayoutProfile(
+            name="type05",
+            description="104 年關務人員考試國文，題號為數字、選項為私有區字元",
+            number_pattern=r"^(\d+)$",
+            question_start=r"(\d{1,2})(?:\s|$)",
+            choice_start=r"Ⓐ",
+            choice_pattern=CIRCLED_CHOICE_PATTERN,
+            glyph_family="moex",
+            cleanups=(
+                FIX_SPLIT_NUMBER,
+                FIX_SPLIT_NUMBER_PAIR,
+            ),
+            join_lines=True,
+            signatures=(SIG_PLAIN_NUMBER, SIG_PUA_CHOICE, SIG_SPLIT_PAGE_HEADER),
+            rejects=(SIG_PUA_NUMBER, SIG_PAGE_HEADER),
+        ),
+    )
+}
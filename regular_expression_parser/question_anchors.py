@@ -0,0 +1,100 @@
+"""
+題號位置索引
+
+將題號位置依 (頁碼, top) 排序後以 bisect 查詢，取代原本每張圖片都走訪全部題號的作法
+（O(圖片數 × 題數)），供 engine.assign_images 與 engine.iter_questions 將圖片分配給題目。
+
+分配方式：
+- preceding：分配給圖片上緣之前最近的題號
+- overlap：圖片跨越多題時，分配給與圖片垂直範圍重疊最多的題目區段
+  （題目區段為該題號到同一頁下一個題號之間），圖片沒有 bottom 時退回 preceding
+"""
+
+from bisect import bisect_left, bisect_right
+
+ASSIGNMENT_MODES = ("preceding", "overlap")
+
+
+class QuestionAnchors:
+    """
+    依 (頁碼, top) 排序的題號位置
+    """
+
+    def __init__(self, question_positions: dict = None):
+        """
+        Args:
+            question_positions (dict): {題號: {"page": 頁碼, "top": TOP}}，
+                未指定則建立空的索引，再以 add 逐一加入
+        """
+        question_positions = question_positions or {}
+        anchors = sorted(
+            ((pos["page"], pos["top"]), number)
+            for number, pos in question_positions.items()
+        )
+        self._keys = [key for key, _ in anchors]
+        self._numbers = [number for _, number in anchors]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, number: str, page: int, top: float):
+        """
+        加入一個題號位置，供逐頁解析時使用
+
+        同一題號再次出現時以新的位置取代，與以 dict 建立索引的結果相同。
+        """
+        if number in self._numbers:
+            index = self._numbers.index(number)
+            del self._keys[index]
+            del self._numbers[index]
+        index = bisect_right(self._keys, (page, top))
+        self._keys.insert(index, (page, top))
+        self._numbers.insert(index, number)
+
+    def preceding(self, page: int, top: float) -> str:
+        """
+        取得位於 (page, top) 之前最近的題號（同一頁時 top 須較小），沒有則回傳 None
+        """
+        index = bisect_left(self._keys, (page, top)) - 1
+        return self._numbers[index] if index >= 0 else None
+
+    def overlapping(self, page: int, top: float, bottom: float) -> str:
+        """
+        取得與 page 頁 top ~ bottom 範圍重疊最多的題目，重疊相同時取較前面的題目
+        """
+        first = max(bisect_left(self._keys, (page, top)) - 1, 0)
+        last = bisect_left(self._keys, (page, bottom)) - 1
+        if last < 0:
+            return None
+
+        target = None
+        max_overlap = None
+        for index in range(first, last + 1):
+            anchor_page, anchor_top = self._keys[index]
+            start = max(anchor_top, top) if anchor_page == page else top
+            end = bottom
+            if index + 1 < len(self._keys) and self._keys[index + 1][0] == page:
+                end = min(self._keys[index + 1][1], bottom)
+            overlap = end - start
+            if max_overlap is None or overlap > max_overlap:
+                target = self._numbers[index]
+                max_overlap = overlap
+        return target
+
+    def assign(self, image_info: dict, mode: str = "preceding") -> str:
+        """
+        依分配方式取得圖片所屬的題號，沒有則回傳 None
+
+        Args:
+            image_info (dict): 圖片資訊，需包含 page 與 top，overlap 另需 bottom
+            mode (str): preceding 或 overlap
+        """
+        if mode not in ASSIGNMENT_MODES:
+            raise ValueError(
+                f"未知的圖片分配方式：{mode}，可用的方式：{', '.join(ASSIGNMENT_MODES)}"
+            )
+        if mode == "overlap" and image_info.get("bottom") is not None:
+            return self.overlapping(
+                image_info["page"], image_info["top"], image_info["bottom"]
+            )
+        return self.preceding(image_info["page"], image_info["top"])
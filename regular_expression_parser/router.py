@@ -0,0 +1,154 @@
+"""
+本機 regex parser 優先、Gemini 備援的考卷路由
+
+gemini_resolver 原本每份考卷都呼叫 Gemini，即使 regex parser 在本機一兩秒內就能正確解析、
+不花任何 token 的考卷，也要花上萬 token 與數十秒。本模組先以 layout_detector 判斷試題 PDF 的版面，
+以對應的 profiles.LayoutProfile 解析題目與答案，再檢查結果：
+
+1. 有解析出題目，且題目數與答案數相同
+2. 題號由 1 開始連續
+3. 每題都有 CHOICE_COUNT 個選項
+
+全部通過的考卷直接使用 regex parser 的結果；版面無法判斷或檢查未通過時回傳原因，
+由 gemini_resolver 改送 Gemini 解析，並在 JSON 的「題庫來源」記錄使用的方式。
+兩種方式的答案都以 engine.answer_fields 轉為 exam_schema.json 的選項索引（從 0 開始）。
+
+使用方式（於專案根目錄執行，只檢查不寫回）：
+    python -m regular_expression_parser.router fse00000001.json fse00000002.json
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+
+from regular_expression_parser import engine, layout_detector
+from regular_expression_parser.engine import (
+    QUESTION_BANK_DIR,
+    QUESTION_IMAGES_DIR,
+    QUESTION_JSON_DIR,
+)
+from regular_expression_parser.profiles import PROFILES
+
+CHOICE_COUNT = 4  # 每題應有的選項數
+
+# 寫入 JSON「題庫來源」欄位的值，regex parser 的結果另附版面名稱（例如 regex:type02）
+SOURCE_REGEX = "regex"
+SOURCE_GEMINI = "gemini"
+
+
+@dataclass
+class LocalResult:
+    """
+    regex parser 的解析與檢查結果
+    """
+
+    layout: str
+    question_bank: list = field(default_factory=list)
+    problems: list = field(default_factory=list)  # 檢查未通過的原因
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    @property
+    def source(self) -> str:
+        return f"{SOURCE_REGEX}:{self.layout}"
+
+
+def validate(questions: list[dict], answers: list) -> list[str]:
+    """
+    檢查 regex parser 解析出的題目與答案
+
+    Args:
+        questions (list[dict]): extract_questions_from_pdf 的結果（依題號排序）
+        answers (list): extract_answers_from_pdf 的結果
+
+    Returns:
+        list[str]: 檢查未通過的原因，全部通過時為空
+    """
+    if not questions:
+        return ["沒有解析出題目"]
+
+    problems = []
+    if len(questions) != len(answers):
+        problems.append(f"題目數 ({len(questions)}) 與答案數 ({len(answers)}) 不一致")
+
+    for expected, question in enumerate(questions, 1):
+        if question["number"] != str(expected):
+            problems.append(
+                f"題號不連續：第 {expected} 題的題號為 {question['number']}"
+            )
+            break
+
+    wrong_choices = [
+        question["number"]
+        for question in questions
+        if len(question["choices"]) != CHOICE_COUNT
+    ]
+    if wrong_choices:
+        problems.append(
+            f"{len(wrong_choices)} 題的選項數不是 {CHOICE_COUNT}："
+            f"{', '.join(wrong_choices[:5])}"
+        )
+    return problems
+
+
+def resolve_locally(
+    question_path: str, answer_path: str, image_dir: str = QUESTION_IMAGES_DIR
+) -> LocalResult:
+    """
+    以 regex parser 解析一份考卷並檢查結果
+
+    Args:
+        question_path (str): 試題 PDF 路徑
+        answer_path (str): 答案 PDF 路徑
+        image_dir (str): 圖片儲存區的資料夾
+
+    Returns:
+        LocalResult: ok 為 True 時 question_bank 為 engine.build_question_bank 的題庫
+    """
+    layout = layout_detector.detect_pdf_layout(question_path)
+    if layout not in PROFILES:
+        return LocalResult(layout, problems=[f"無法判斷版面（{layout}）"])
+
+    profile = PROFILES[layout]
+    try:
+        questions = engine.extract_questions_from_pdf(
+            question_path, profile, image_dir=image_dir
+        )
+    except Exception as e:
+        return LocalResult(layout, problems=[f"解析試題失敗：{e}"])
+    answers = engine.extract_answers_from_pdf(answer_path, profile)
+
+    problems = validate(questions, answers)
+    if problems:
+        return LocalResult(layout, problems=problems)
+    return LocalResult(layout, engine.build_question_bank(questions, answers))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="檢查考卷能否以 regex parser 解析（不寫回 JSON）"
+    )
+    arg_parser.add_argument("json_files", nargs="+", help="要檢查的 JSON 檔名")
+    arg_parser.add_argument("--json-dir", default=QUESTION_JSON_DIR)
+    arg_parser.add_argument("--bank-dir", default=QUESTION_BANK_DIR)
+    args = arg_parser.parse_args()
+
+    results = {}
+    for json_filename in args.json_files:
+        with open(os.path.join(args.json_dir, json_filename), encoding="utf-8") as f:
+            exam_data = json.load(f)
+        results[json_filename] = resolve_locally(
+            os.path.join(args.bank_dir, exam_data.get("試題檔案", "")),
+            os.path.join(args.bank_dir, exam_data.get("測驗式試題答案檔案", "")),
+        )
+
+    for json_filename, result in results.items():
+        if result.ok:
+            print(f"[{json_filename}] {result.source}：{len(result.question_bank)} 題")
+        else:
+            print(f"[{json_filename}] {SOURCE_GEMINI}：{'；'.join(result.problems)}")
+    local = sum(result.ok for result in results.values())
+    print(f"共 {len(results)} 份，{local} 份可由 regex parser 解析")
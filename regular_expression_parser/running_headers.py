@@ -0,0 +1,201 @@
+"""
+重複的頁首、頁尾移除
+
+原本以 re.sub 在串接後的全文上移除頁首，例如 代號：…\n頁次：… 與 type04 的 （請接背面）…測驗），
+帶 DOTALL 的 lazy pattern 在頁首格式稍有不同時會一路掃到很後面，沒有比對到時頁首又會併入題目。
+
+本模組改以座標判斷：同一行文字（數字視為相同，例如 頁次：8－1 與 頁次：8－2）
+在一半以上的頁面出現在相同高度（誤差 Y_TOLERANCE 以內）即視為頁首或頁尾，
+只檢查每頁最前與最後 MARGIN_LINES 行，避免將內文中重複的短行（例如下標數字）誤判為頁首，
+在組成全文前由各頁的文字、字元 top 與文字區塊中移除。
+判斷只使用 walk_pages 的逐頁資料，pdfplumber、poppler 與快取讀取的頁面都適用。
+逐頁處理（iter_stripped_pages）時只以前 DEFAULT_WINDOW 頁判斷，之後的頁面直接套用。
+"""
+
+import math
+import re
+from collections import defaultdict
+from itertools import islice
+from typing import Iterable, Iterator
+
+# 同一個頁首在各頁的高度誤差
+Y_TOLERANCE = 3
+# 至少在多少比例的頁面出現才視為頁首或頁尾
+MIN_PAGE_RATIO = 0.5
+# 每頁只檢查最前與最後幾行
+MARGIN_LINES = 4
+# 逐頁處理時用來判斷頁首頁尾的頁數
+DEFAULT_WINDOW = 6
+
+_DIGITS = re.compile(r"\d+")
+
+
+def page_lines(page_data: dict) -> list[tuple[int, int, str, float]]:
+    """
+    將一頁的文字分行
+
+    Returns:
+        list[tuple[int, int, str, float]]: (起始位置, 結束位置（含換行）, 數字替換為 # 的文字, top)
+            空白行不列入
+    """
+    text = page_data["text"]
+    tops = page_data["tops"]
+    lines = []
+    start = 0
+    while start <= len(text):
+        end = text.find("\n", start)
+        end = len(text) if end == -1 else end + 1
+        line = text[start:end].strip()
+        line_tops = [top for top in tops[start:end] if top is not None]
+        if line and line_tops:
+            lines.append((start, end, _DIGITS.sub("#", line), min(line_tops)))
+        if end == len(text):
+            break
+        start = end
+    return lines
+
+
+def _margin_lines(page_data: dict) -> list[tuple[int, int, str, float]]:
+    """
+    取得一頁最前與最後 MARGIN_LINES 行
+    """
+    lines = page_lines(page_data)
+    if len(lines) > 2 * MARGIN_LINES:
+        lines = lines[:MARGIN_LINES] + lines[-MARGIN_LINES:]
+    return lines
+
+
+def find_running_bands(
+    pages: list[dict],
+    min_ratio: float = MIN_PAGE_RATIO,
+    tolerance: float = Y_TOLERANCE,
+) -> list[tuple[str, float]]:
+    """
+    找出在多數頁面相同高度重複出現的行
+
+    Returns:
+        list[tuple[str, float]]: (數字替換為 # 的文字, 該行在各頁中最小的 top)
+    """
+    if len(pages) < 2:
+        return []
+    min_pages = max(2, math.ceil(len(pages) * min_ratio))
+
+    occurrences = defaultdict(list)
+    for index, page_data in enumerate(pages):
+        for _, _, key, top in _margin_lines(page_data):
+            occurrences[key].append((top, index))
+
+    bands = []
+    for key, items in occurrences.items():
+        if len({index for _, index in items}) < min_pages:
+            continue
+        # 依 top 分群，與群中最高的一行差距在誤差以內視為同一高度
+        items.sort()
+        cluster = [items[0]]
+        for item in items[1:] + [None]:
+            if item is not None and item[0] - cluster[0][0] <= tolerance:
+                cluster.append(item)
+                continue
+            if len({index for _, index in cluster}) >= min_pages:
+                bands.append((key, cluster[0][0]))
+            cluster = [item]
+    return bands
+
+
+def match_running_lines(
+    page_data: dict, bands: list[tuple[str, float]], tolerance: float = Y_TOLERANCE
+) -> list[tuple[int, int, float]]:
+    """
+    找出一頁中屬於頁首或頁尾的行
+
+    Returns:
+        list[tuple[int, int, float]]: (起始位置, 結束位置, top)
+    """
+    return [
+        (start, end, top)
+        for start, end, key, top in _margin_lines(page_data)
+        if any(
+            key == band_key and 0 <= top - band_top <= tolerance
+            for band_key, band_top in bands
+        )
+    ]
+
+
+def _strip_page(
+    page_data: dict, lines: list[tuple[int, int, float]], tolerance: float
+) -> dict:
+    """
+    由一頁的文字、字元 top 與文字區塊中移除指定的行
+    """
+    text = page_data["text"]
+    tops = page_data["tops"]
+    text_parts = []
+    top_parts = []
+    position = 0
+    for start, end, _ in sorted(lines):
+        text_parts.append(text[position:start])
+        top_parts.extend(tops[position:start])
+        position = end
+    text_parts.append(text[position:])
+    top_parts.extend(tops[position:])
+
+    line_tops = [top for _, _, top in lines]
+    words = [
+        word
+        for word in page_data["words"]
+        if all(abs(word["top"] - top) > tolerance for top in line_tops)
+    ]
+    return {**page_data, "text": "".join(text_parts), "tops": top_parts, "words": words}
+
+
+def strip_page(
+    page_data: dict, bands: list[tuple[str, float]], tolerance: float = Y_TOLERANCE
+) -> dict:
+    """
+    移除一頁中符合 bands 的頁首與頁尾，沒有符合的行則回傳原本的頁面
+    """
+    lines = match_running_lines(page_data, bands, tolerance)
+    return _strip_page(page_data, lines, tolerance) if lines else page_data
+
+
+def strip_running_lines(
+    pages: list[dict],
+    min_ratio: float = MIN_PAGE_RATIO,
+    tolerance: float = Y_TOLERANCE,
+) -> list[dict]:
+    """
+    移除各頁重複的頁首與頁尾
+
+    Args:
+        pages (list[dict]): walk_pages 產生的頁面
+
+    Returns:
+        list[dict]: 移除頁首頁尾後的頁面，其餘欄位不變
+    """
+    bands = find_running_bands(pages, min_ratio, tolerance)
+    return [strip_page(page_data, bands, tolerance) for page_data in pages]
+
+
+def iter_stripped_pages(
+    pages: Iterable[dict],
+    window: int = DEFAULT_WINDOW,
+    min_ratio: float = MIN_PAGE_RATIO,
+    tolerance: float = Y_TOLERANCE,
+) -> Iterator[dict]:
+    """
+    逐頁移除頁首與頁尾
+
+    先暫存前 window 頁找出頁首頁尾的位置，之後的頁面直接套用，
+    記憶體用量只與 window 有關，不隨頁數增加。
+
+    Args:
+        pages (Iterable[dict]): walk_pages 產生的頁面
+        window (int): 用來判斷頁首頁尾的頁數
+    """
+    pages = iter(pages)
+    head = list(islice(pages, window))
+    bands = find_running_bands(head, min_ratio, tolerance)
+    for page_data in head:
+        yield strip_page(page_data, bands, tolerance)
+    for page_data in pages:
+        yield strip_page(page_data, bands, tolerance)
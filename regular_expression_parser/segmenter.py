@@ -0,0 +1,144 @@
+"""
+題目切分
+
+原本以 re.DOTALL 的 regex 在全文上一次找出所有題目，例如 type02 的
+(?sm)^\\s*(\\d+)\\s+(.*?)(?=\\nⒶ)\\s*((?:(?!^\\s*\\d+\\s).)*)，
+遇到格式異常的 PDF 時大量回溯，單一檔案可能要數分鐘。
+
+本模組改為逐行掃描：每行只以版面設定的 question_start / choice_start 在行首比對一次，
+遇到題號行開始新題目，遇到第一個選項行之後的內容為選項區，直到下一個題號行，
+處理時間與全文長度成正比。
+
+每份文件另有步數（行數）與時間的上限，超過時丟出 SegmentationBudgetExceeded，
+由呼叫端（例如 batch_runner）列入失敗清單，而不是卡住整批。
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+
+DEFAULT_MAX_STEPS = 500_000  # 每份文件最多掃描的行數
+DEFAULT_MAX_SECONDS = 30.0  # 每份文件最多花費的秒數
+
+# 每隔多少步檢查一次時間
+_CLOCK_INTERVAL = 1024
+
+
+class SegmentationBudgetExceeded(Exception):
+    """
+    切分題目超過步數或時間上限
+    """
+
+
+@dataclass
+class Budget:
+    """
+    單一文件的切分預算
+    """
+
+    max_steps: int = DEFAULT_MAX_STEPS
+    max_seconds: float = DEFAULT_MAX_SECONDS
+    steps: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def step(self, count: int = 1):
+        """
+        記錄步數，超過上限時丟出 SegmentationBudgetExceeded
+        """
+        self.steps += count
+        if self.steps > self.max_steps:
+            raise SegmentationBudgetExceeded(f"超過 {self.max_steps} 步")
+        if self.steps % _CLOCK_INTERVAL < count:
+            elapsed = time.perf_counter() - self.started
+            if elapsed > self.max_seconds:
+                raise SegmentationBudgetExceeded(
+                    f"超過 {self.max_seconds} 秒（已處理 {self.steps} 步）"
+                )
+
+
+@dataclass
+class Segment:
+    """
+    切分出的一道題目
+
+    Attributes:
+        number: 題號字元（尚未經過 number_map 轉換）
+        question: 題目文字（題號之後到第一個選項之前）
+        choices_text: 選項區文字
+        start: 題目在全文中的起始位置
+        end: 題目在全文中的結束位置
+    """
+
+    number: str
+    question: str
+    choices_text: str
+    start: int
+    end: int
+
+
+def segment_questions(
+    content: str,
+    question_start: re.Pattern,
+    choice_start: re.Pattern,
+    budget: Budget = None,
+) -> list[Segment]:
+    """
+    逐行切分題目
+
+    Args:
+        content (str): 全文
+        question_start (re.Pattern): 題號行的 pattern，以 match 比對行首，group(1) 為題號，
+            比對結束之後為題目文字
+        choice_start (re.Pattern): 第一個選項行的 pattern，以 match 比對行首
+        budget (Budget): 切分預算，未指定則使用預設上限
+
+    Returns:
+        list[Segment]: 依出現順序排列的題目，沒有選項的題號行會併入前一題的題目文字
+    """
+    budget = budget or Budget()
+    segments = []
+
+    number = None
+    start = 0
+    question_lines = []
+    choice_lines = []
+
+    def close(end):
+        if number is not None and choice_lines:
+            segments.append(
+                Segment(
+                    number,
+                    "\n".join(question_lines),
+                    "\n".join(choice_lines),
+                    start,
+                    end,
+                )
+            )
+
+    position = 0
+    for line in content.split("\n"):
+        budget.step()
+        line_start = position
+        position += len(line) + 1
+
+        # 題號行只在尚未開始或已進入選項區時開始新題目
+        if number is None or choice_lines:
+            match = question_start.match(line)
+            if match:
+                close(line_start)
+                number = match.group(1)
+                start = line_start
+                question_lines = [line[match.end() :]]
+                choice_lines = []
+                continue
+            if choice_lines:
+                choice_lines.append(line)
+            continue
+
+        if choice_start.match(line):
+            choice_lines = [line]
+        else:
+            question_lines.append(line)
+
+    close(len(content))
+    return segments
@@ -0,0 +1,355 @@
+"""
+url.csv 增量同步
+
+dl_101010.py 依 CSV 順序以全域計數器產生 fse id，只要 CSV 中間多了一列，
+後面所有的 id 都會位移，因此每次都得整份重跑。本模組改為：
+
+1. 以（考試代碼, 類科代碼, 節次）為 key，比對最新的 CSV 與上一次的快照
+2. 只下載新增或內容有變動的列，並建立/更新對應的 JSON 與考試目錄（exam_catalog.db）
+3. 已存在的考試沿用 fse_id_map.json 中記錄的 id，新考試則從目前最大 id 往後編號
+
+第一次執行時若還沒有 id 對照表，會依照 dl_101010.py 的規則（有試題或答案網址的列
+才會取號）從快照重建，讓既有的 fse id 保持不變。
+
+使用方式：
+    python url_sync.py --fetch
+    python url_sync.py --csv url.csv --snapshot url_snapshot.csv
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+
+import dl_101010
+import downloader
+from blob_store import BlobStore
+from download_manifest import DEFAULT_MANIFEST_PATH, DownloadManifest
+from exam_catalog import DEFAULT_CATALOG_PATH, ExamCatalog
+
+logger = logging.getLogger(__name__)
+
+CSV_URL = "https://wwwc.moex.gov.tw/main/Exam/wHandExamQandA_CSV.ashx"
+DEFAULT_SNAPSHOT_PATH = "url_snapshot.csv"
+DEFAULT_ID_MAP_PATH = "fse_id_map.json"
+
+# CSV 欄位索引
+EXAM_CODE_COL = 1
+CATEGORY_CODE_COL = 6
+SESSION_COL = 8
+QUESTION_URL_COL = 11
+ANSWER_URL_COL = 12
+
+
+def row_key(row: list[str]) -> str:
+    """
+    以（考試代碼, 類科代碼, 節次）組成一列的 key
+    """
+    return "_".join((row[EXAM_CODE_COL], row[CATEGORY_CODE_COL], row[SESSION_COL]))
+
+
+def load_csv_rows(csv_file_path: str) -> dict[str, list[str]]:
+    """
+    讀取 url.csv，回傳依 CSV 順序排列的 {key: row}
+
+    重複的 key 只保留第一列。
+    """
+    rows = {}
+    with open(csv_file_path, mode="r", encoding="utf-8") as file:
+        csv_reader = csv.reader(file)
+        next(csv_reader)  # 讀取標題列並略過
+
+        for row in csv_reader:
+            row = [col.strip('"') for col in row]
+            key = row_key(row)
+            if key in rows:
+                logger.warning(f"重複的 key，略過: {key}")
+                continue
+            rows[key] = row
+    return rows
+
+
+def diff_rows(
+    old_rows: dict[str, list[str]], new_rows: dict[str, list[str]]
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    比對新舊 CSV
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: (新增, 變動, 移除) 的 key 列表
+    """
+    added = [key for key in new_rows if key not in old_rows]
+    changed = [
+        key for key in new_rows if key in old_rows and new_rows[key] != old_rows[key]
+    ]
+    removed = [key for key in old_rows if key not in new_rows]
+    return added, changed, removed
+
+
+class IdRegistry:
+    """
+    key 與 fse id 的對照表，儲存為 JSON 檔
+    """
+
+    def __init__(self, path: str = DEFAULT_ID_MAP_PATH):
+        self.path = path
+        self.ids = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.ids = json.load(f)
+        self._next = max((int(v[3:]) for v in self.ids.values()), default=0) + 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, key: str) -> str:
+        return self.ids.get(key)
+
+    def assign(self, key: str) -> str:
+        """
+        取得 key 的 id，若尚未取號則配發下一個序號
+        """
+        if key not in self.ids:
+            self.ids[key] = f"fse{self._next:08d}"
+            self._next += 1
+        return self.ids[key]
+
+    def bootstrap(self, csv_file_path: str):
+        """
+        依照 dl_101010.py 的規則重建對照表：依 CSV 順序，有試題或答案網址的列才取號
+
+        重複的 key 在 dl_101010.py 中也會佔用一個序號，因此這裡同樣跳號，
+        只記錄第一次出現的 id。
+        """
+        sequence = 1
+        with open(csv_file_path, mode="r", encoding="utf-8") as file:
+            csv_reader = csv.reader(file)
+            next(csv_reader)  # 讀取標題列並略過
+
+            for row in csv_reader:
+                row = [col.strip('"') for col in row]
+                if not row[QUESTION_URL_COL] and not row[ANSWER_URL_COL]:
+                    continue
+                self.ids.setdefault(row_key(row), f"fse{sequence:08d}")
+                sequence += 1
+        self._next = max(self._next, sequence)
+
+    def save(self):
+        tmp_path = f"{self.path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False, indent=0)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_latest_csv(csv_file_path: str, url: str = CSV_URL):
+    """
+    從考選部資料開放專區下載最新的 url.csv
+    """
+    logger.info(f"下載最新的 url.csv: {url}")
+    session = downloader.create_session(1)
+    try:
+        task = downloader.DownloadTask(url, csv_file_path, "url.csv")
+        downloader.download_file(session, task)
+    finally:
+        session.close()
+
+
+def write_exam_json(
+    row: list[str],
+    exam_id: str,
+    json_folder: str,
+    catalog: ExamCatalog = None,
+) -> str:
+    """
+    建立或更新考試的 JSON
+
+    JSON 已存在（包括第一次執行時 dl_101010.py 建立的 JSON）且試題與答案網址都沒變時，
+    保留原本已解析的題庫與題庫來源，只更新其他欄位；網址變動時題庫才重設為空。
+
+    Returns:
+        str: JSON 檔案路徑
+    """
+    question_filename = None
+    answer_filename = None
+    exam_code = row[EXAM_CODE_COL]
+    category_code = row[CATEGORY_CODE_COL]
+    session = row[SESSION_COL]
+    if row[QUESTION_URL_COL]:
+        question_filename = downloader.build_pdf_filename(
+            exam_code, category_code, session, "Q"
+        )
+    if row[ANSWER_URL_COL]:
+        answer_filename = downloader.build_pdf_filename(
+            exam_code, category_code, session, "A"
+        )
+
+    exam_data = dl_101010.create_exam_json(
+        row, question_filename, answer_filename, exam_id=exam_id
+    )
+
+    json_path = os.path.join(json_folder, f"{exam_id}.json")
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            old_data = json.load(f)
+        if (
+            old_data.get("試題網址") == exam_data["試題網址"]
+            and old_data.get("測驗式試題答案網址") == exam_data["測驗式試題答案網址"]
+        ):
+            for field in ("題庫", "題庫來源"):
+                if field in old_data:
+                    exam_data[field] = old_data[field]
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(exam_data, f, ensure_ascii=False, indent=2)
+    if catalog is not None:
+        catalog.upsert(exam_data, json_path, os.path.getmtime(json_path))
+    return json_path
+
+
+def url_changed(old_row: list[str], row: list[str], column: int) -> bool:
+    """
+    檢查快照中的同一列是否有不同的網址（新增的列沒有舊網址，不需強制下載）
+    """
+    return old_row is not None and old_row[column] != row[column]
+
+
+def sync(
+    csv_file_path: str = dl_101010.csv_file_path,
+    snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+    id_map_path: str = DEFAULT_ID_MAP_PATH,
+    json_folder: str = dl_101010.question_json_folder,
+    bank_folder: str = dl_101010.question_bank_folder,
+    manifest_path: str = DEFAULT_MANIFEST_PATH,
+    catalog_path: str = DEFAULT_CATALOG_PATH,
+) -> dict:
+    """
+    以快照比對最新的 url.csv，只處理新增或變動的列
+
+    Returns:
+        dict: 同步結果統計
+    """
+    os.makedirs(json_folder, exist_ok=True)
+    os.makedirs(bank_folder, exist_ok=True)
+
+    new_rows = load_csv_rows(csv_file_path)
+    old_rows = load_csv_rows(snapshot_path) if os.path.exists(snapshot_path) else {}
+    added, changed, removed = diff_rows(old_rows, new_rows)
+    logger.info(
+        f"CSV 比對完成：共 {len(new_rows)} 列，新增 {len(added)}，"
+        f"變動 {len(changed)}，移除 {len(removed)}"
+    )
+    for key in removed:
+        logger.warning(f"最新的 CSV 已無此列（保留既有 JSON 與 PDF）: {key}")
+
+    registry = IdRegistry(id_map_path)
+    if not len(registry):
+        # 沒有快照時（第一次執行）以最新的 CSV 取號，結果與 dl_101010.py 相同
+        registry.bootstrap(snapshot_path if old_rows else csv_file_path)
+        logger.info(f"重建 id 對照表，共 {len(registry)} 筆")
+
+    tasks = []
+    json_paths = []
+    with ExamCatalog(catalog_path) as catalog:
+        for key in added + changed:
+            row = new_rows[key]
+            question_url = row[QUESTION_URL_COL]
+            answer_url = row[ANSWER_URL_COL]
+            if not question_url and not answer_url:
+                continue
+
+            exam_id = registry.assign(key)
+            json_paths.append(write_exam_json(row, exam_id, json_folder, catalog))
+
+            exam_code = row[EXAM_CODE_COL]
+            category_code = row[CATEGORY_CODE_COL]
+            session = row[SESSION_COL]
+            # 網址變動的列沿用同一個檔名，本機的舊檔即使大小相同也是舊內容，需強制重新下載
+            old_row = old_rows.get(key)
+            if question_url:
+                filename = downloader.build_pdf_filename(
+                    exam_code, category_code, session, "Q"
+                )
+                tasks.append(
+                    downloader.DownloadTask(
+                        question_url,
+                        os.path.join(bank_folder, filename),
+                        "試題",
+                        force=url_changed(old_row, row, QUESTION_URL_COL),
+                    )
+                )
+            if answer_url:
+                filename = downloader.build_pdf_filename(
+                    exam_code, category_code, session, "A"
+                )
+                tasks.append(
+                    downloader.DownloadTask(
+                        answer_url,
+                        os.path.join(bank_folder, filename),
+                        "答案",
+                        force=url_changed(old_row, row, ANSWER_URL_COL),
+                    )
+                )
+
+    # id 對照表先寫回，下載中斷時下次執行仍會沿用相同的 id
+    registry.save()
+    logger.info(f"已建立/更新 {len(json_paths)} 個 JSON 檔案")
+
+    manifest = DownloadManifest(manifest_path)
+    try:
+        stats = downloader.download_all(
+            tasks,
+            manifest=manifest,
+            blob_store=BlobStore(os.path.join(bank_folder, ".blobs")),
+        )
+    finally:
+        manifest.close()
+
+    # 全部處理完才更新快照，失敗的列下次仍會被視為新增或變動
+    if stats.failed == 0:
+        shutil.copyfile(csv_file_path, snapshot_path)
+        logger.info(f"已更新快照: {snapshot_path}")
+    else:
+        logger.warning(f"有 {stats.failed} 個檔案下載失敗，快照未更新")
+
+    return {
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed),
+        "json_files": json_paths,
+        "download": stats,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="url.csv 增量同步")
+    parser.add_argument("--fetch", action="store_true", help="先下載最新的 url.csv")
+    parser.add_argument("--csv", default=dl_101010.csv_file_path, help="最新的 url.csv")
+    parser.add_argument(
+        "--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="上一次的快照"
+    )
+    parser.add_argument("--id-map", default=DEFAULT_ID_MAP_PATH, help="fse id 對照表")
+    parser.add_argument("--json-folder", default=dl_101010.question_json_folder)
+    parser.add_argument("--bank-folder", default=dl_101010.question_bank_folder)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH)
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_latest_csv(args.csv)
+
+    sync(
+        args.csv,
+        args.snapshot,
+        args.id_map,
+        args.json_folder,
+        args.bank_folder,
+        args.manifest,
+        args.catalog,
+    )
@@ -8,14 +8,21 @@
 
 compose_images function：將PDF頁面中的分散圖片按照位置合併成完整圖片
 extract_text_with_images function：從PDF中提取文字和圖片
+encoded_image function：取得可直接寫入檔案、不需解碼的 JPEG / JPEG 2000 圖片資料
 
 """
 
 import os
 import io
 from PIL import Image, ImageOps
+from pdfminer.pdftypes import LITERALS_DCT_DECODE, LITERALS_JPX_DECODE
 from pdfplumber import page
 
+from image_store import ImageStore
+
+# 可直接寫入檔案的 JPEG 色彩模式，其他模式（例如 CMYK）仍需解碼轉換為 RGB
+PASSTHROUGH_JPEG_MODES = ("RGB", "L")
+
 
 def compose_images(
     pieces: list[dict], page: page, pdf_name: str, page_num: int, folder_name: str
@@ -31,8 +38,8 @@ def compose_images(
             grouped_images[x0] = []
         grouped_images[x0].append(img)
 
-    # 建立合併圖片儲存目錄
-    os.makedirs("merged_images", exist_ok=True)
+    # 圖片依內容 hash 存放，檔名為儲存區中的相對路徑
+    store = ImageStore(folder_name)
 
     # 遍歷每組圖片進行合併
     for group_idx, (group_key, imgs) in enumerate(grouped_images.items(), 1):
@@ -42,6 +49,25 @@ def compose_images(
         # 依y0排序圖片（PDF座標y0越大表示越上方<所以需要reverse>）
         sorted_imgs = sorted(imgs, key=lambda x: x["y0"], reverse=True)
 
+        # 只有一張且已是 JPEG / JPEG 2000 編碼的圖片直接寫入，不需解碼再合併
+        encoded = encoded_image(sorted_imgs[0]) if len(sorted_imgs) == 1 else None
+        if encoded:
+            extension, data = encoded
+            image_filename = store.put(data, extension)
+            output_path = store.path(image_filename)
+            img = sorted_imgs[0]
+            return_list.append(
+                {
+                    "filename": image_filename,
+                    "bbox": [img["x0"], img["y0"], img["x1"], img["y1"]],
+                    "top": img["top"],
+                    "bottom": img["bottom"],
+                    "page": page_num,
+                }
+            )
+            print(f"已儲存圖片 {group_idx}（未重新編碼），儲存至: {output_path}")
+            continue
+
         # 提取所有PIL圖片並計算總尺寸
         pil_imgs = []
         total_height = 0
@@ -86,11 +112,8 @@ def compose_images(
             y_offset += pil_img.height
 
         # 儲存合併後的圖片
-        image_filename = (
-            f"{pdf_name}_page{page_num}_img{group_idx}.{file_format.lower()}"
-        )
-        output_path = os.path.join(folder_name, image_filename)
-        merged_img.save(output_path, file_format)
+        image_filename = store.put_image(merged_img, file_format)
+        output_path = store.path(image_filename)
 
         # 計算合併後圖片的實際座標範圍
 
@@ -115,6 +138,7 @@ def compose_images(
                 "filename": image_filename,
                 "bbox": merged_bbox,
                 "top": top,
+                "bottom": max(img["bottom"] for img in sorted_imgs),
                 "page": page_num,
             }
         )
@@ -142,3 +166,42 @@ def detect_image_format(image_stream: bytes) -> str:
         return None
     else:
         return file_format
+
+
+def encoded_image(image_obj: dict) -> tuple[str, bytes]:
+    """
+    取得 PDF 中已是完整 JPEG（DCTDecode）或 JPEG 2000（JPXDecode）編碼的圖片資料
+
+    只有單一 filter 的圖片可直接寫入檔案；JPEG 另需為 RGB 或灰階，
+    只讀取檔頭判斷色彩模式，不解碼像素。
+
+    Args:
+        image_obj (dict): pdfplumber 的圖片物件
+
+    Returns:
+        tuple[str, bytes]: (副檔名, 圖片資料)，需要解碼或轉換的圖片回傳 None
+    """
+    stream = image_obj["stream"]
+    filters = stream.get_filters()
+    if len(filters) != 1:
+        return None
+    name = filters[0][0]
+
+    if name in LITERALS_DCT_DECODE:
+        data = stream.get_data()
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                mode = image.mode
+        except Exception:
+            return None
+        if mode not in PASSTHROUGH_JPEG_MODES:
+            return None
+        return "jpeg", data
+
+    if name in LITERALS_JPX_DECODE:
+        data = stream.get_data()
+        if data.startswith(b"\x00\x00\x00\x0cjP  \r\n\x87\n"):
+            return "jp2", data
+        if data.startswith(b"\xff\x4f\xff\x51"):
+            return "j2k", data
+    return None